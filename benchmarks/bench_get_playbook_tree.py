@@ -0,0 +1,152 @@
+# File: bench_get_playbook_tree.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+"""Run the get playbook tree action end to end against a local stand-in for the SOAR REST API.
+
+Each tree is given as DEPTHxFANOUTxAPPS: the number of playbook levels below the root, the child playbook runs per playbook run and
+the app runs per playbook run. The fake SOAR server runs in this process, and the action runs in a fresh process for each tree, with
+phantom.rules.requests replaced by plain requests and phantom.rules.build_phantom_rest_url pointing to the fake server, so the peak
+RSS only covers the connector. The action is started from a leaf playbook run, so the root lookup is part of the measurement.
+
+One JSON object per tree is printed with the request count, wall time, peak RSS and output size, and appended to --output as a JSON
+line when it is given, so the results can be compared across releases. Needs the SOAR platform libraries (phantom) to be importable.
+
+Usage: python benchmarks/bench_get_playbook_tree.py [--trees 3x3x2 4x4x3] [--latency 5] [--config '{"max_concurrent_requests": 4}']
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+
+from fake_soar import FakeSoarServer, generate_tree
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_tree(value):
+    try:
+        depth, fanout, apps = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected DEPTHxFANOUTxAPPS, got {value}")
+    return depth, fanout, apps
+
+
+def run_action(base_url, config, param, results):
+    """Run get playbook tree in the current process, meant to be the target of a fresh process."""
+    sys.path.insert(0, REPO_DIR)
+
+    import phantom.rules as ph_rules
+    import requests
+
+    ph_rules.requests = requests
+    ph_rules.build_phantom_rest_url = lambda *parts: "/".join([f"{base_url}/rest", *(str(part) for part in parts)])
+
+    from playbookutils_connector import PlaybookUtilsConnector
+
+    in_json = {
+        "action": "get playbook tree",
+        "identifier": "get_playbook_tree",
+        "asset_id": "1",
+        # The run tree cache and the run graph index are kept across runs, they are disabled unless the configuration enables them
+        "config": {
+            "appname": "-",
+            "directory": REPO_DIR,
+            "main_module": "playbookutils_connector.py",
+            "tree_cache_max_entries": 0,
+            "run_index_max_age": 0,
+            **config,
+        },
+        "parameters": [param],
+    }
+
+    connector = PlaybookUtilsConnector()
+    start = time.perf_counter()
+    output = connector._handle_action(json.dumps(in_json), None)
+    wall_time = time.perf_counter() - start
+
+    action_results = json.loads(output)
+    results.put(
+        {
+            "status": action_results[0]["status"] if action_results else "failed",
+            "message": action_results[0]["message"] if action_results else None,
+            "wall_time": round(wall_time, 4),
+            # kilobytes on Linux
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "output_bytes": len(output.encode()),
+            "output_rows": sum(len(action_result.get("data", [])) for action_result in action_results),
+        }
+    )
+
+
+def run_tree(tree, args):
+    depth, fanout, apps = tree
+    pb_runs, app_runs = generate_tree(depth, fanout, apps, running=args.running)
+    server = FakeSoarServer(pb_runs, app_runs, latency=args.latency / 1000)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    param = {"playbook_run_id": max(pb_runs), "include_app_runs": not args.no_app_runs}
+
+    with server:
+        # The server stays in this process, only the action runs in the child process
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+
+        process = context.Process(target=run_action, args=(server.base_url, args.config, param, results))
+        process.start()
+        result = results.get()
+        process.join()
+        server.shutdown()
+
+    return {
+        "tree": f"{depth}x{fanout}x{apps}",
+        "playbook_runs": len(pb_runs),
+        "app_runs": len(app_runs) if param["include_app_runs"] else 0,
+        "latency_ms": args.latency,
+        "config": args.config,
+        "requests": server.request_count,
+        "response_bytes": server.bytes_sent,
+        **result,
+    }
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argparser.add_argument("--trees", nargs="+", type=parse_tree, default=[(2, 3, 2), (3, 4, 3), (4, 5, 2)], help="DEPTHxFANOUTxAPPS")
+    argparser.add_argument("--latency", type=float, default=0, help="Latency added to each request, in milliseconds")
+    argparser.add_argument("--running", type=float, default=0, help="Share of the runs that are still running")
+    argparser.add_argument("--no-app-runs", action="store_true", help="Run the action with include_app_runs disabled")
+    argparser.add_argument("--config", type=json.loads, default={}, help="Asset configuration, as JSON")
+    argparser.add_argument("--output", help="File to append the results to, one JSON line per tree")
+    args = argparser.parse_args()
+
+    for tree in args.trees:
+        result = run_tree(tree, args)
+        print(json.dumps(result))
+        if args.output:
+            with open(args.output, "a") as f:
+                f.write(json.dumps(result) + "\n")
+
+        if result["status"] != "success":
+            sys.exit(f"get playbook tree failed for {result['tree']}: {result['message']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# File: bench_import_time.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+"""Measure the import time of the connector module with `python -X importtime`.
+
+The SOAR platform modules the connector depends on are imported first, so only the modules loaded by the connector itself are
+counted. Each run uses a fresh interpreter, and the median of the runs is reported as JSON with the slowest modules. The script
+exits with an error if a heavy module that should only be imported on demand (bs4, anytree, requests, sqlite3) is loaded by the
+connector import, or if the import takes longer than --max-ms. Needs the SOAR platform libraries (phantom) to be importable.
+
+Usage: python benchmarks/bench_import_time.py [--runs 5] [--max-ms 50]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only imported on the code paths that need them
+DEFERRED_MODULES = ("bs4", "anytree", "requests", "sqlite3")
+
+MARKER = "import time: connector import starts"
+
+IMPORT_SCRIPT = f"""
+import sys
+import phantom.app
+import phantom.rules
+import phantom.action_result
+import phantom.base_connector
+print({MARKER!r}, file=sys.stderr, flush=True)
+import playbookutils_connector
+"""
+
+
+def measure_import():
+    """Import the connector in a fresh interpreter.
+
+    Returns:
+        dict: Self and cumulative import times in microseconds keyed by module name, for the modules the connector loaded
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([REPO_DIR, os.environ.get("PYTHONPATH", "")])}
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT], cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+    lines = process.stderr.splitlines()
+    modules = {}
+    for line in lines[lines.index(MARKER) + 1 :]:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # Header line
+            continue
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+
+    return modules
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argparser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to import the connector in")
+    argparser.add_argument("--max-ms", type=float, help="Fail if the median import time is above this many milliseconds")
+    argparser.add_argument("--top", type=int, default=10, help="Number of slowest modules to report")
+    args = argparser.parse_args()
+
+    runs = [measure_import() for _ in range(args.runs)]
+    import_times = [modules["playbookutils_connector"][1] for modules in runs]
+    median_run = runs[import_times.index(sorted(import_times)[len(import_times) // 2])]
+
+    loaded = sorted(name for name in median_run if name.split(".")[0] in DEFERRED_MODULES)
+    slowest = sorted(median_run.items(), key=lambda item: item[1][0], reverse=True)[: args.top]
+    result = {
+        "connector_import_ms": round(statistics.median(import_times) / 1000, 2),
+        "min_ms": round(min(import_times) / 1000, 2),
+        "max_ms": round(max(import_times) / 1000, 2),
+        "modules_loaded": len(median_run),
+        "slowest_modules": [{"module": name, "self_ms": round(self_us / 1000, 2)} for name, (self_us, _) in slowest],
+        "deferred_modules_loaded": loaded,
+    }
+    print(json.dumps(result, indent=4))
+
+    if loaded:
+        sys.exit(f"Modules that should be imported on demand were loaded by the connector import: {', '.join(loaded)}")
+    if args.max_ms is not None and result["connector_import_ms"] > args.max_ms:
+        sys.exit(f"Connector import took {result['connector_import_ms']}ms, more than {args.max_ms}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# File: bench_output_emitter.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+"""Check that the get playbook tree output emitter scales linearly with the number of runs.
+
+The single pass RunTree.iter_output emitter is timed on synthetic trees up to 50k runs, and compared with the previous
+RenderTree + DictExporter output on the smaller trees. The script exits with an error if the time per run of the largest tree is
+more than --max-slowdown times the time per run of the smallest tree.
+
+Usage: python benchmarks/bench_output_emitter.py [--nodes 1000 5000 10000 50000] [--max-slowdown 3]
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from anytree import RenderTree
+from anytree.exporter import DictExporter
+from bench_tree_memory import build_run_tree, generate_runs
+
+
+def emit_single_pass(run_tree):
+    rows = []
+    for _, data, line in run_tree.iter_output():
+        rows.append((data, line))
+    return rows
+
+
+def emit_dict_exporter(run_tree):
+    """Output loop of get playbook tree before the single pass emitter, each export copies the whole subtree of the node."""
+    exporter = DictExporter()
+    rows = []
+    for pre, fill, node in RenderTree(run_tree.to_anytree()):
+        pre = pre.replace(" ", "\u2007")
+        fill = fill.replace(" ", "\u2007")
+        data = exporter.export(node)
+        data["tree_prefix"] = pre
+        data["tree_fill"] = fill
+        if "children" in data:
+            del data["children"]
+        if node.type == "app":
+            line = f"{pre}<{node.type}-{node.run_id}> {node.action} [{node.status}]"
+        else:
+            line = f"{pre}<{node.type}-{node.run_id}> {node.name}"
+        rows.append((data, line))
+    return rows
+
+
+def best_time(emit, run_tree, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = emit(run_tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return rows, best
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--nodes", type=int, nargs="+", default=[1000, 5000, 10000, 50000], help="Number of runs in each tree")
+    argparser.add_argument("--fanout", type=int, default=4, help="Child playbook runs per playbook run")
+    argparser.add_argument("--apps", type=int, default=3, help="App runs per playbook run")
+    argparser.add_argument("--compare-up-to", type=int, default=10000, help="Largest tree to also time with the DictExporter output")
+    argparser.add_argument("--repeat", type=int, default=3, help="Number of timings per tree, the best one is kept")
+    argparser.add_argument("--max-slowdown", type=float, default=3.0, help="Allowed growth of the time per run")
+    args = argparser.parse_args()
+
+    results = []
+    for node_count in sorted(args.nodes):
+        run_tree = build_run_tree(generate_runs(node_count, args.fanout, args.apps))
+
+        rows, elapsed = best_time(emit_single_pass, run_tree, args.repeat)
+        result = {
+            "nodes": len(run_tree),
+            "single_pass_seconds": round(elapsed, 4),
+            "single_pass_us_per_node": round(elapsed / len(run_tree) * 1e6, 2),
+        }
+
+        if node_count <= args.compare_up_to:
+            exporter_rows, exporter_elapsed = best_time(emit_dict_exporter, run_tree, 1)
+            if rows != exporter_rows:
+                raise AssertionError(f"The emitters produce different output for {node_count} nodes")
+            result["dict_exporter_seconds"] = round(exporter_elapsed, 4)
+            result["speedup"] = round(exporter_elapsed / elapsed, 1)
+
+        results.append(result)
+
+    slowdown = results[-1]["single_pass_us_per_node"] / results[0]["single_pass_us_per_node"]
+    print(json.dumps({"results": results, "slowdown": round(slowdown, 2)}, indent=4))
+
+    if slowdown > args.max_slowdown:
+        print(f"Time per node grew {slowdown:.2f}x from {results[0]['nodes']} to {results[-1]['nodes']} nodes", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# File: bench_tree_memory.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+"""Compare the memory used by the anytree PlaybookRun/AppRun model and the compact RunTree model on synthetic trees.
+
+Usage: python benchmarks/bench_tree_memory.py [--nodes 1000 5000 20000] [--fanout 4] [--apps 3]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anytree import RenderTree
+
+from playbookutils_anytree import AppRun, PlaybookRun
+from playbookutils_runtree import RunTree
+
+
+def generate_runs(node_count, fanout, apps):
+    """Generate the details of a synthetic tree in level order, with the fields kept by the default run projection.
+
+    Returns:
+        list: (run type, run details, index of the parent run) tuples
+    """
+    runs = [("playbook", {"id": 1, "parent_run": None, "_pretty_playbook": "local/root", "status": "success"}, -1)]
+    next_id = 2
+    parent = 0
+    while len(runs) < node_count:
+        parent_id = runs[parent][1]["id"]
+        if runs[parent][0] == "playbook":
+            for _ in range(apps):
+                details = {
+                    "id": next_id,
+                    "playbook_run": parent_id,
+                    "action": "run query",
+                    "_pretty_action_run": "run_query_1",
+                    "status": "success",
+                }
+                runs.append(("app", details, parent))
+                next_id += 1
+            for _ in range(fanout):
+                details = {"id": next_id, "parent_run": parent_id, "_pretty_playbook": "local/child", "status": "success"}
+                runs.append(("playbook", details, parent))
+                next_id += 1
+        parent += 1
+
+    return runs[:node_count]
+
+
+def build_anytree(runs):
+    nodes = []
+    for run_type, details, parent in runs:
+        nodes.append((AppRun if run_type == "app" else PlaybookRun)(details, nodes[parent] if parent >= 0 else None))
+    return nodes[0]
+
+
+def build_run_tree(runs):
+    run_tree = RunTree()
+    for run_type, details, parent in runs:
+        run_tree.add(details, run_type, parent)
+    return run_tree
+
+
+def measure(build, runs):
+    """Measure the memory allocated to build a tree, the run details themselves are allocated beforehand and not counted."""
+    gc.collect()
+    tracemalloc.start()
+    tree = build(runs)
+    allocated, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tree, allocated, peak
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--nodes", type=int, nargs="+", default=[1000, 5000, 20000], help="Number of runs in each tree")
+    argparser.add_argument("--fanout", type=int, default=4, help="Child playbook runs per playbook run")
+    argparser.add_argument("--apps", type=int, default=3, help="App runs per playbook run")
+    args = argparser.parse_args()
+
+    results = []
+    for node_count in args.nodes:
+        runs = generate_runs(node_count, args.fanout, args.apps)
+
+        root, anytree_bytes, anytree_peak = measure(build_anytree, runs)
+        run_tree, compact_bytes, compact_peak = measure(build_run_tree, runs)
+
+        # Both models have to render the same tree
+        anytree_rows = [(pre, fill, node.run_id) for pre, fill, node in RenderTree(root)]
+        compact_rows = [(pre, fill, run_tree.run_id(node)) for pre, fill, node in run_tree.iter_render()]
+        if anytree_rows != compact_rows:
+            raise AssertionError(f"The models render different trees for {node_count} nodes")
+
+        results.append(
+            {
+                "nodes": len(runs),
+                "anytree_bytes": anytree_bytes,
+                "anytree_peak_bytes": anytree_peak,
+                "anytree_bytes_per_node": round(anytree_bytes / len(runs), 1),
+                "compact_bytes": compact_bytes,
+                "compact_peak_bytes": compact_peak,
+                "compact_bytes_per_node": round(compact_bytes / len(runs), 1),
+                "ratio": round(anytree_bytes / compact_bytes, 2),
+            }
+        )
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
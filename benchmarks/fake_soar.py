@@ -0,0 +1,192 @@
+# File: fake_soar.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+"""Local stand-in for the SOAR REST API, serving a synthetic tree of playbook runs and app runs.
+
+Only the parts of the playbook_run, app_run and version endpoints used by the connector are implemented: getting a record or one of
+its fields by ID, and listing records with `_filter_<field>`, `_filter_<field>__in`, `_filter_<field>__gt`, `page_size`, `page` and
+`sort=id`. The number of requests served is available from the `/_stats` endpoint.
+"""
+
+import ast
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+
+STATUSES = ("success", "success", "success", "failed")
+
+
+def generate_tree(depth, fanout, apps, root_id=1, running=0.0, message_size=200):
+    """Generate the records of a synthetic playbook tree.
+
+    Args:
+        depth (int): Number of playbook levels below the root playbook run
+        fanout (int): Child playbook runs per playbook run
+        apps (int): App runs per playbook run
+        root_id (int): Run ID of the root playbook run
+        running (float): Share of the runs that are still running
+        message_size (int): Size of the message field, to get realistic response sizes
+
+    Returns:
+        dict: Playbook run records keyed by ID
+        dict: App run records keyed by ID
+    """
+    pb_runs = {}
+    app_runs = {}
+    pb_ids = itertools.count(root_id)
+    app_ids = itertools.count(root_id)
+    message = "x" * message_size
+
+    def status(run_id):
+        if running and run_id % round(1 / running) == 0:
+            return "running"
+        return STATUSES[run_id % len(STATUSES)]
+
+    level = [(None, 0)]
+    while level:
+        next_level = []
+        for parent_run, level_depth in level:
+            pb_run_id = next(pb_ids)
+            pb_runs[pb_run_id] = {
+                "id": pb_run_id,
+                "parent_run": parent_run,
+                "playbook": 100 + level_depth,
+                "container": 1,
+                "status": status(pb_run_id),
+                "message": message,
+                "misc": {"scope": "new", "parent_playbook_run": parent_run},
+                "start_time": "2021-04-12T18:31:27.160000Z",
+                "update_time": "2021-04-12T18:31:28.075344Z",
+                "_pretty_playbook": f"local/playbook_level_{level_depth}",
+                "_pretty_scm_name": "local",
+            }
+            for _ in range(apps):
+                app_run_id = next(app_ids)
+                app_runs[app_run_id] = {
+                    "id": app_run_id,
+                    "playbook_run": pb_run_id,
+                    "action": "run query",
+                    "app_name": "Playbook Utils",
+                    "asset": 1,
+                    "status": status(app_run_id),
+                    "message": message,
+                    "start_time": "2021-04-12T18:31:27.160000Z",
+                    "end_time": "2021-04-12T18:31:30.928000Z",
+                    "update_time": "2021-04-12T18:31:30.928000Z",
+                    "_pretty_action_run": f"run_query_{app_run_id}",
+                    "_pretty_asset": "asset",
+                }
+            if level_depth < depth:
+                next_level.extend((pb_run_id, level_depth + 1) for _ in range(fanout))
+        level = next_level
+
+    return pb_runs, app_runs
+
+
+def _match(record, key, value):
+    field, _, operator = key[len("_filter_") :].partition("__")
+    expected = ast.literal_eval(value)
+    actual = record.get(field)
+    if operator == "in":
+        return actual in expected
+    if operator == "gt":
+        return actual is not None and actual > expected
+    return actual == expected
+
+
+class FakeSoarServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, pb_runs, app_runs, latency=0.0, address=("127.0.0.1", 0)):
+        self.records = {"playbook_run": pb_runs, "app_run": app_runs}
+        self.latency = latency
+        self.request_count = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        super().__init__(address, FakeSoarHandler)
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def build_rest_url(self, *parts):
+        """Replacement for phantom.rules.build_phantom_rest_url that points to this server."""
+        return "/".join([f"{self.base_url}/rest", *(str(part) for part in parts)])
+
+
+class FakeSoarHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = [part for part in url.path.split("/") if part]
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+
+        if path == ["_stats"]:
+            return self._send(200, {"requests": self.server.request_count, "bytes_sent": self.server.bytes_sent})
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if path[:1] != ["rest"] or len(path) < 2:
+            return self._send(404, {"failed": True, "message": "Not found"})
+
+        endpoint = path[1]
+        if endpoint == "version":
+            return self._send(200, {"version": "6.3.0"})
+
+        records = self.server.records.get(endpoint)
+        if records is None:
+            return self._send(404, {"failed": True, "message": f"Unknown endpoint {endpoint}"})
+
+        if len(path) > 2:
+            record = records.get(int(path[2]))
+            if record is None:
+                return self._send(404, {"failed": True, "message": "Item not found"})
+            if len(path) > 3:
+                return self._send(200, {path[3]: record.get(path[3])})
+            return self._send(200, record)
+
+        filters = [(key, value) for key, value in params.items() if key.startswith("_filter_")]
+        matched = [record for record in records.values() if all(_match(record, key, value) for key, value in filters)]
+        matched.sort(key=lambda record: record["id"])
+
+        page_size = int(params.get("page_size", 10))
+        page = int(params.get("page", 0))
+        num_pages = 1
+        if page_size:
+            num_pages = max(1, -(-len(matched) // page_size))
+            matched = matched[page * page_size : (page + 1) * page_size]
+
+        return self._send(200, {"count": len(matched), "num_pages": num_pages, "data": matched})
+
+    def _send(self, status_code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+        with self.server.lock:
+            if self.path != "/_stats":
+                self.server.request_count += 1
+                self.server.bytes_sent += len(payload)
@@ -0,0 +1,53 @@
+# File: playbookutils_anytree.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+from anytree import NodeMixin
+
+
+class Run(NodeMixin):
+    def __init__(self, run_details, parent=None, children=None):
+        self.run_details = run_details
+
+        self.parent = parent
+        if children:
+            self.children = children
+
+    def add_error(self, message):
+        """Record an error that happened while expanding this run, the error is included in the run output."""
+        if not hasattr(self, "errors"):
+            self.errors = []
+        self.errors.append(message)
+
+
+class PlaybookRun(Run):
+    def __init__(self, run_details, parent=None, children=None):
+        self.type = "playbook"
+
+        self.run_id = run_details["id"]
+        self.name = run_details["_pretty_playbook"]
+
+        super().__init__(run_details, parent, children)
+
+
+class AppRun(Run):
+    def __init__(self, run_details, parent=None, children=None):
+        self.type = "app"
+
+        self.run_id = run_details["id"]
+        self.name = run_details["action"]
+        self.action = run_details["_pretty_action_run"]
+        self.status = run_details["status"]
+
+        super().__init__(run_details, parent, children)
@@ -14,46 +14,23 @@
 # and limitations under the License.
 
 import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import chain
 
 import phantom.app as phantom
-import requests
-from anytree import NodeMixin, RenderTree
-from anytree.exporter import DictExporter
-from bs4 import BeautifulSoup
 from phantom import rules as ph_rules
 from phantom.action_result import ActionResult
 from phantom.base_connector import BaseConnector
 
-
-class Run(NodeMixin):
-    def __init__(self, run_details, parent=None, children=None):
-        self.run_details = run_details
-
-        self.parent = parent
-        if children:
-            self.children = children
-
-
-class PlaybookRun(Run):
-    def __init__(self, run_details, parent=None, children=None):
-        self.type = "playbook"
-
-        self.run_id = run_details["id"]
-        self.name = run_details["_pretty_playbook"]
-
-        super().__init__(run_details, parent, children)
-
-
-class AppRun(Run):
-    def __init__(self, run_details, parent=None, children=None):
-        self.type = "app"
-
-        self.run_id = run_details["id"]
-        self.name = run_details["action"]
-        self.action = run_details["_pretty_action_run"]
-        self.status = run_details["status"]
-
-        super().__init__(run_details, parent, children)
+from playbookutils_consts import *
+from playbookutils_runtree import RunTree
+from playbookutils_scheduler import RequestScheduler
+from playbookutils_stats import TreeStats
+from playbookutils_timing import ActionTimer
 
 
 class RetVal(tuple):
@@ -67,6 +44,62 @@ class PlaybookUtilsConnector(BaseConnector):
         super().__init__()
 
         self._state = None
+        # Monotonic time the action run started, before any query was sent
+        self._start_time = time.monotonic()
+        self._max_concurrent_requests = PLAYBOOKUTILS_DEFAULT_MAX_CONCURRENT_REQUESTS
+        self._max_tree_depth = PLAYBOOKUTILS_DEFAULT_MAX_TREE_DEPTH
+        # Child to parent playbook run links learned during this action run
+        self._parent_runs = {}
+        # Opened on first use by _get_run_index
+        self._run_index = None
+        self._run_index_max_age = PLAYBOOKUTILS_DEFAULT_RUN_INDEX_MAX_AGE
+        self._tree_cache_max_entries = PLAYBOOKUTILS_DEFAULT_TREE_CACHE_MAX_ENTRIES
+        self._tree_cache_max_age = PLAYBOOKUTILS_DEFAULT_TREE_CACHE_MAX_AGE
+        self._tree_cache_max_bytes = PLAYBOOKUTILS_DEFAULT_TREE_CACHE_MAX_BYTES
+        self._page_size = PLAYBOOKUTILS_DEFAULT_PAGE_SIZE
+        self._max_nodes = PLAYBOOKUTILS_DEFAULT_MAX_NODES
+        self._node_count = 0
+        # Fields kept from each run, None keeps all the fields
+        self._run_fields = None
+        self._truncated = False
+        self._timer = ActionTimer(False)
+        self._enable_timing = False
+        self._log_timing = False
+        self._debug_capture = PLAYBOOKUTILS_DEFAULT_DEBUG_CAPTURE
+        self._debug_capture_bytes = PLAYBOOKUTILS_DEFAULT_DEBUG_CAPTURE_BYTES
+        # Debug data captured by the queries that use their own action result, added to the action result of the action run
+        self._query_debug_data = []
+        self._request_timeout = PLAYBOOKUTILS_DEFAULT_REQUEST_TIMEOUT
+        self._scheduler = RequestScheduler(0, 0, 0, ())
+
+    def _validate_integer(self, action_result, parameter, key, allow_zero=False):
+        """Validate that a parameter is a non-negative integer.
+
+        Args:
+            action_result (ActionResult): Action result or BaseConnector object
+            parameter (Any): Parameter value to validate
+            key (str): Name of the parameter, used in the error message
+            allow_zero (bool): Whether zero is a valid value
+
+        Returns:
+            RetVal:
+                bool: Action result status
+                int: Integer value of the parameter, None on error
+        """
+        if parameter is not None:
+            try:
+                if not float(parameter).is_integer():
+                    return RetVal(action_result.set_status(phantom.APP_ERROR, PLAYBOOKUTILS_VALID_INT_MSG.format(key=key)), None)
+                parameter = int(parameter)
+            except (TypeError, ValueError):
+                return RetVal(action_result.set_status(phantom.APP_ERROR, PLAYBOOKUTILS_VALID_INT_MSG.format(key=key)), None)
+
+            if parameter < 0:
+                return RetVal(action_result.set_status(phantom.APP_ERROR, PLAYBOOKUTILS_NON_NEG_INT_MSG.format(key=key)), None)
+            if not allow_zero and parameter == 0:
+                return RetVal(action_result.set_status(phantom.APP_ERROR, PLAYBOOKUTILS_NON_NEG_NON_ZERO_INT_MSG.format(key=key)), None)
+
+        return RetVal(phantom.APP_SUCCESS, parameter)
 
     def _process_empty_response(self, response, action_result):
         if response.status_code == 200:
@@ -79,8 +112,7 @@ class PlaybookUtilsConnector(BaseConnector):
         status_code = response.status_code
 
         try:
-            soup = BeautifulSoup(response.text, "html.parser")
-            error_text = soup.text
+            error_text = self._html_to_text(response.text)
             split_lines = error_text.split("\n")
             split_lines = [x.strip() for x in split_lines if x.strip()]
             error_text = "\n".join(split_lines)
@@ -95,7 +127,8 @@ class PlaybookUtilsConnector(BaseConnector):
     def _process_json_response(self, r, action_result):
         # Try a json parse
         try:
-            resp_json = r.json()
+            with self._timer.json_decode():
+                resp_json = r.json()
         except Exception as e:
             return RetVal(action_result.set_status(phantom.APP_ERROR, f"Unable to parse JSON response. Error: {e}"), None)
 
@@ -109,12 +142,35 @@ class PlaybookUtilsConnector(BaseConnector):
         return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
 
     def _process_response(self, r, action_result):
+        ret_val, resp = self._parse_response(r, action_result)
+
         # store the r_text in debug data, it will get dumped in the logs if the action fails
-        if hasattr(action_result, "add_debug_data"):
-            action_result.add_debug_data({"r_status_code": r.status_code})
-            action_result.add_debug_data({"r_text": r.text})
-            action_result.add_debug_data({"r_headers": r.headers})
+        if self._debug_capture == "truncated" or (self._debug_capture == "errors" and phantom.is_fail(ret_val)):
+            self._add_debug_data(r, action_result)
+
+        return RetVal(ret_val, resp)
+
+    def _add_debug_data(self, r, action_result):
+        """Add a response to the debug data of an action result, following the debug capture policy of the asset. With the truncated
+        policy only the first bytes of the body are decoded, so large successful responses are not decoded a second time.
 
+        Args:
+            r (Response): Response of a REST call
+            action_result (ActionResult): Action result to add the debug data to
+        """
+        if not hasattr(action_result, "add_debug_data"):
+            return
+
+        if self._debug_capture == "truncated":
+            r_text = r.content[: self._debug_capture_bytes].decode("utf-8", errors="replace")
+        else:
+            r_text = r.text
+
+        action_result.add_debug_data({"r_status_code": r.status_code})
+        action_result.add_debug_data({"r_text": r_text})
+        action_result.add_debug_data({"r_headers": r.headers})
+
+    def _parse_response(self, r, action_result):
         # Process each 'Content-Type' of response separately
 
         # Process a json response
@@ -139,6 +195,25 @@ class PlaybookUtilsConnector(BaseConnector):
 
         return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
 
+    def _html_to_text(self, html):
+        """Extract the text of an HTML error page. BeautifulSoup is only imported here, as most action runs never get an HTML
+        response, and the standard library parser is used when it is not available.
+
+        Args:
+            html (str): HTML document
+
+        Returns:
+            str: Text of the document
+        """
+        try:
+            from bs4 import BeautifulSoup
+        except ImportError:
+            from playbookutils_html import html_to_text
+
+            return html_to_text(html)
+
+        return BeautifulSoup(html, "html.parser").text
+
     def _make_rest_call(self, url, action_result, method="get", **kwargs):
         # **kwargs can be any additional parameters that requests.request accepts
 
@@ -151,13 +226,39 @@ class PlaybookUtilsConnector(BaseConnector):
         except AttributeError:
             return RetVal(action_result.set_status(phantom.APP_ERROR, f"Invalid method: {method}"), resp_json)
 
-        try:
-            r = request_func(url, verify=config.get("verify_server_cert", False), timeout=30, **kwargs)
-        except Exception as e:
-            return RetVal(action_result.set_status(phantom.APP_ERROR, f"Error Connecting to server. Details: {e}"), resp_json)
+        # Transient failures are retried with a backoff, every attempt waits for its turn when the requests per second are limited
+        attempt = 0
+        while True:
+            self._scheduler.wait_turn()
+            try:
+                start = time.perf_counter()
+                r = request_func(url, verify=config.get("verify_server_cert", False), timeout=self._request_timeout, **kwargs)
+            except Exception as e:
+                from requests import exceptions as requests_exceptions
+
+                retryable_error = isinstance(e, (requests_exceptions.ConnectionError, requests_exceptions.Timeout))
+                delay = self._scheduler.retry_delay(attempt, retryable_error=retryable_error)
+                if delay is None:
+                    return RetVal(action_result.set_status(phantom.APP_ERROR, f"Error Connecting to server. Details: {e}"), resp_json)
+            else:
+                if self._timer.enabled:
+                    self._timer.record_request(self._get_endpoint_name(url), time.perf_counter() - start, len(r.content))
+
+                delay = self._scheduler.retry_delay(attempt, response=r)
+                if delay is None:
+                    break
+
+            self.debug_print(f"Retrying {url} in {delay:.2f}s, attempt {attempt + 1} of {self._scheduler.max_retries}")
+            time.sleep(delay)
+            attempt += 1
 
         return self._process_response(r, action_result)
 
+    def _get_endpoint_name(self, url):
+        """Name of the REST endpoint of a URL without the run IDs, like playbook_run or playbook_run/parent_run."""
+        path = url.partition("/rest/")[2].split("?")[0]
+        return "/".join(part for part in path.split("/") if part and not part.isdigit()) or url
+
     def _determine_pb_run_id(self, action_result):
         """Figure out what the current playbook run id is by using the app_run_id, if it is running in a playbook. The current playbook
         run is the playbook run calling this specific instance of the current app run. If there is no associated playbook run, this will
@@ -216,79 +317,424 @@ class PlaybookUtilsConnector(BaseConnector):
 
         return RetVal(phantom.APP_SUCCESS, repo_pb_names)
 
-    def _attach_pb_runs(self, action_result, pb_run, include_app_runs):
-        """Attach playbook runs to the playbook.
+    def _chunk_run_ids(self, run_ids, chunk_count=1):
+        """Split run IDs into lists small enough to be sent as a single `_filter_<field>__in` query parameter.
 
         Args:
-            action_result (ActionResult): Action result
-            pb_run (PlaybookRun): Playbook run to attach app runs
+            run_ids (list): Run IDs to split
+            chunk_count (int): Minimum number of lists to spread the run IDs over, so they can be fetched concurrently
+
+        Yields:
+            list: Run IDs that fit in one query parameter
+        """
+        max_chunk_size = max(1, -(-len(run_ids) // chunk_count))
+
+        chunk = []
+        # URL encoded "[" and "]"
+        chunk_length = 6
+        for run_id in run_ids:
+            # Each ID is followed by an URL encoded ","
+            id_length = len(str(run_id)) + 3
+            if chunk and (chunk_length + id_length > PLAYBOOKUTILS_MAX_FILTER_LENGTH or len(chunk) >= max_chunk_size):
+                yield chunk
+                chunk = []
+                chunk_length = 6
+            chunk.append(run_id)
+            chunk_length += id_length
+
+        if chunk:
+            yield chunk
+
+    def _iter_runs_in(self, endpoint, filter_field, run_ids, extra_params=None, fields=None):
+        """Get the runs of an endpoint where the filter field matches any of the run IDs, one page at a time. When paging is disabled
+        all the runs are returned in a single page. Each call uses its own action result, so it is safe to run in a worker thread.
+
+        Args:
+            endpoint (str): REST endpoint to query (playbook_run or app_run)
+            filter_field (str): Field to filter on (parent_run or playbook_run)
+            run_ids (list): Playbook run IDs to match
+            extra_params (dict): Additional filters for the query
+            fields (tuple): Fields of the runs to keep, None keeps the configured run fields
+
+        Yields:
+            RetVal:
+                bool: ActionResult status
+                list: Run details of one page sorted by ID, or the error message on failure
+        """
+        page = 0
+        while True:
+            ret_val, resp, num_pages = self._fetch_runs_page(endpoint, filter_field, run_ids, extra_params, page, fields)
+            yield RetVal(ret_val, resp)
+            if phantom.is_fail(ret_val):
+                return
+
+            page += 1
+            if page >= num_pages:
+                return
+
+    def _fetch_runs_page(self, endpoint, filter_field, run_ids, extra_params, page, fields=None):
+        """Get one page of the runs of an endpoint where the filter field matches any of the run IDs. Each call uses its own action
+        result, so it is safe to run in a worker thread, and its debug data is kept to be added to the action result of the action run.
+
+        Args:
+            endpoint (str): REST endpoint to query (playbook_run or app_run)
+            filter_field (str): Field to filter on (parent_run or playbook_run)
+            run_ids (list): Playbook run IDs to match
+            extra_params (dict): Additional filters for the query
+            page (int): Page number, starting at 0
+            fields (tuple): Fields of the runs to keep, None keeps the configured run fields
 
         Returns:
-            bool: Action result status
+            bool: ActionResult status
+            list: Run details of the page sorted by ID, or the error message on failure
+            int: Number of pages of the query, 1 when paging is disabled
         """
-        params = {"pretty": True, "_filter_parent_run": pb_run.run_id, "page_size": 0, "sort": "id"}
-        ret_val, child_pb_runs = self._make_rest_call(ph_rules.build_phantom_rest_url("playbook_run"), action_result, params=params)
+        action_result = ActionResult()
+        params = {
+            "pretty": True,
+            f"_filter_{filter_field}__in": f"[{','.join(str(run_id) for run_id in run_ids)}]",
+            "page_size": self._page_size,
+            "sort": "id",
+            **(extra_params or {}),
+            "page": page,
+        }
+
+        ret_val, resp_json = self._make_rest_call(ph_rules.build_phantom_rest_url(endpoint), action_result, params=params)
+        self._query_debug_data.extend(action_result.get_debug_data())
         if phantom.is_fail(ret_val):
-            return action_result.get_status()
+            return action_result.get_status(), action_result.get_message(), 0
+
+        num_pages = resp_json.get("num_pages", 0) if self._page_size else 1
+        return phantom.APP_SUCCESS, [self._project_run(run, fields) for run in resp_json.get("data", [])], num_pages
+
+    def _iter_queries(self, queries, fields=None):
+        """Get the runs of several queries, one page at a time in the order of the queries. When concurrency is enabled the first
+        page of every query is requested at once, and the other pages of a query as soon as its first page tells how many there
+        are. The pages of a query stop at its first failed page, which does not stop the other queries.
+
+        Args:
+            queries (list): Endpoint, filter field, run IDs and additional filters of each query, as passed to _iter_runs_in
+            fields (tuple): Fields of the runs to keep, None keeps the configured run fields
 
-        for child_pb_run_details in child_pb_runs.get("data", []):
-            child_pb_run = PlaybookRun(child_pb_run_details, pb_run)
-            ret_val = self._attach_descendants(action_result, child_pb_run, include_app_runs)
+        Yields:
+            tuple: Query the page belongs to
+            RetVal:
+                bool: ActionResult status
+                list: Run details of one page sorted by ID, or the error message on failure
+        """
+        if self._max_concurrent_requests <= 1:
+            for query in queries:
+                for page in self._iter_runs_in(*query, fields=fields):
+                    yield query, page
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self._max_concurrent_requests)
+
+        def fetch_first_page(query):
+            first_page = self._fetch_runs_page(*query, 0, fields)
+            ret_val, _, num_pages = first_page
+            other_pages = []
+            if phantom.is_success(ret_val):
+                other_pages = [executor.submit(self._fetch_runs_page, *query, page, fields) for page in range(1, num_pages)]
+            return first_page, other_pages
+
+        try:
+            first_pages = [executor.submit(fetch_first_page, query) for query in queries]
+            for query, first_page in zip(queries, first_pages):
+                first_page, other_pages = first_page.result()
+                for ret_val, resp, _ in chain([first_page], (other_page.result() for other_page in other_pages)):
+                    yield query, RetVal(ret_val, resp)
+                    if phantom.is_fail(ret_val):
+                        for other_page in other_pages:
+                            other_page.cancel()
+                        break
+        finally:
+            # Do not start the remaining pages when the caller stops early
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _iter_level(self, pb_run_ids, include_app_runs, extra_params=None, app_run_params=None, include_pb_runs=True):
+        """Get the app runs and child playbook runs of a whole tree level, one page at a time. The IDs are chunked to stay below the
+        URL length limit. All the app run pages are returned before the playbook run pages, so app runs can be attached before the
+        child playbook runs of the same parent.
+
+        When concurrency is enabled the chunks, both endpoints and the pages of each chunk are fetched in parallel, and the pages
+        are returned in order as soon as they arrive. A failed chunk does not stop the other chunks.
+
+        Args:
+            pb_run_ids (list): Playbook run IDs of one tree level
+            include_app_runs (bool): Get the app runs of the playbook runs
+            extra_params (dict): Additional filters for the queries
+            app_run_params (dict): Additional filters for the app run queries only
+            include_pb_runs (bool): Get the child playbook runs of the playbook runs
+
+        Yields:
+            str: Endpoint of the page (playbook_run or app_run)
+            list: Playbook run IDs of the chunk the page belongs to
+            RetVal:
+                bool: ActionResult status
+                list: Run details of one page sorted by ID, or the error message on failure
+        """
+        chunks = list(self._chunk_run_ids(sorted(pb_run_ids), self._max_concurrent_requests))
+        queries = []
+        if include_pb_runs:
+            queries = [("playbook_run", "parent_run", chunk, extra_params) for chunk in chunks]
+        if include_app_runs:
+            app_run_params = {**(extra_params or {}), **(app_run_params or {})}
+            queries = [("app_run", "playbook_run", chunk, app_run_params) for chunk in chunks] + queries
+
+        for (endpoint, _, chunk, _), page in self._iter_queries(queries):
+            yield endpoint, chunk, page
+
+    def _fetch_level(self, pb_run_ids, include_app_runs, extra_params=None):
+        """Fetch all the app runs and child playbook runs of a whole tree level.
+
+        Args:
+            pb_run_ids (list): Playbook run IDs of one tree level
+            include_app_runs (bool): Fetch the app runs of the playbook runs
+            extra_params (dict): Additional filters for the queries
+
+        Returns:
+            list: App run details sorted by ID
+            list: Child playbook run details sorted by ID
+            dict: Error messages keyed by the playbook run ID whose descendants could not be fetched
+        """
+        runs = {"app_run": [], "playbook_run": []}
+        errors = {}
+        for endpoint, chunk, (ret_val, resp) in self._iter_level(pb_run_ids, include_app_runs, extra_params):
             if phantom.is_fail(ret_val):
-                return action_result.get_status()
+                self._record_level_error(errors, endpoint, chunk, resp)
+                continue
 
-        return phantom.APP_SUCCESS
+            runs[endpoint].extend(resp)
 
-    def _attach_app_runs(self, action_result, pb_run):
-        """Attach app runs to a playbook as descendants
+        return (sorted(runs["app_run"], key=lambda run: run["id"]), sorted(runs["playbook_run"], key=lambda run: run["id"]), errors)
+
+    def _record_level_error(self, errors, endpoint, chunk, message):
+        """Record the error of a failed query for each playbook run of its chunk.
 
         Args:
-            action_result (ActionResult): Action result
-            pb_run (PlaybookRun): Playbook run to attach app runs
+            errors (dict): Error messages keyed by playbook run ID
+            endpoint (str): Endpoint of the failed query
+            chunk (list): Playbook run IDs of the failed query
+            message (str): Error message
+        """
+        self.debug_print(message)
+        for run_id in chunk:
+            errors.setdefault(run_id, []).append(f"Unable to get the {endpoint} descendants: {message}")
+
+    def _project_run(self, run_details, fields=None):
+        """Drop the fields of a run that are not in the configured projection, so only they are stored in the tree and the output.
+
+        Args:
+            run_details (dict): Run details returned by the REST API
+            fields (tuple): Fields to keep instead of the configured run fields
 
         Returns:
-            bool: Action result status
+            dict: Run details with only the projected fields
         """
-        params = {"pretty": True, "_filter_playbook_run": pb_run.run_id, "page_size": 0, "sort": "id"}
-        ret_val, app_runs = self._make_rest_call(ph_rules.build_phantom_rest_url("app_run"), action_result, params=params)
-        if phantom.is_fail(ret_val):
-            return action_result.get_status()
+        fields = fields or self._run_fields
+        if fields is None:
+            return run_details
 
-        for app_run in app_runs.get("data", []):
-            if app_run.get("id"):
-                # ret_val, app_run_details = self._get_app_run(action_result, app_run['id'])
-                # if phantom.is_fail(ret_val):
-                #     self.debug_print(f'Error getting details about app_run: {app_run["id"]}')
-                #     continue
-                # if app_run_details.get('failed'):
-                #     self.debug_print(f'Error returned when getting details about app_run: {app_run["id"]} Error: {app_run_details["message"]}')
-                #     continue
+        return {field: run_details[field] for field in fields if field in run_details}
 
-                AppRun(app_run, pb_run)
+    def _node_limit_reached(self):
+        """Check whether the tree reached the configured maximum number of nodes. Once it is reached the tree is marked as truncated.
 
-        return phantom.APP_SUCCESS
+        Returns:
+            bool: True if no more nodes should be attached
+        """
+        if self._max_nodes and self._node_count >= self._max_nodes:
+            self._truncated = True
+
+        return self._truncated
+
+    def _attach_pb_runs(self, run_tree, pb_runs, child_pb_runs):
+        """Attach the child playbook runs of a whole tree level to their parents.
+
+        Args:
+            run_tree (RunTree): Tree to attach the playbook runs to
+            pb_runs (dict): Node indexes of the playbook runs of one tree level keyed by run ID
+            child_pb_runs (list): Child playbook run details sorted by ID
+
+        Returns:
+            list: Node indexes of the child playbook runs that were attached, which make up the next tree level
+        """
+        attached_pb_runs = []
+        for child_pb_run in child_pb_runs:
+            if self._node_limit_reached():
+                break
+
+            self._parent_runs[child_pb_run["id"]] = child_pb_run["parent_run"]
+            attached_pb_runs.append(run_tree.add(child_pb_run, "playbook", pb_runs[child_pb_run["parent_run"]]))
+            self._node_count += 1
+
+        return attached_pb_runs
+
+    def _attach_app_runs(self, run_tree, pb_runs, app_runs):
+        """Attach the app runs of a whole tree level to their playbook runs as descendants
+
+        Args:
+            run_tree (RunTree): Tree to attach the app runs to
+            pb_runs (dict): Node indexes of the playbook runs of one tree level keyed by run ID
+            app_runs (list): App run details sorted by ID
+        """
+        for app_run in app_runs:
+            if self._node_limit_reached():
+                break
+
+            if app_run.get("id"):
+                # The details that are not in the run fields are added afterwards by _enrich_app_runs, in a few batched queries
+                run_tree.add(app_run, "app", pb_runs[app_run["playbook_run"]])
+                self._node_count += 1
+
+    def _attach_descendants(self, action_result, run_tree, parent_pb_runs, include_app_runs, max_depth=None, app_run_params=None):
+        """Attach app runs or child playbooks to other playbooks. The tree is expanded one level at a time, so the number of
+        requests depends on the depth of the tree instead of the number of playbook runs in it. Several trees of a forest can be
+        expanded together, sharing the queries of each level. Runs are attached as each page arrives, and the expansion stops once
+        the maximum number of nodes is reached.
 
-    def _attach_descendants(self, action_result, parent_pb_run, include_app_runs):
-        """Attach app runs or child playbooks to another playbook
+        The tree can be pruned while it is expanded: the child playbook runs below the maximum depth are never requested, and the
+        app run filters are passed to the app run queries. A pruned tree does not use or fill the playbook tree cache.
 
         Args:
             action_result (ActionResult): Action result
-            parent_pb_run (PlaybookRun): Playbook run to attach descendants
+            run_tree (RunTree): Tree to attach the descendants to
+            parent_pb_runs (list): Node indexes of the playbook runs to attach descendants
             include_app_runs (bool): Include app runs as descendants to the playbook
+            max_depth (int): Number of playbook run levels to expand below the parent playbook runs, None to expand the whole tree
+            app_run_params (dict): Filters of the app runs to attach
 
         Returns:
             bool: Action result status
         """
+        pruned = max_depth is not None or bool(app_run_params)
+        tree_pb_runs = []
+        level = list(parent_pb_runs)
+        depth = 0
+        while level and not self._truncated:
+            tree_pb_runs.extend(level)
+            pb_runs = {run_tree.run_id(pb_run): pb_run for pb_run in level}
+            level = []
+            include_pb_runs = max_depth is None or depth < max_depth
+            depth += 1
+
+            # The children of finished playbook runs come from the playbook tree cache of the run graph index, only the other
+            # playbook runs are fetched. The runs of a parent all come from the same source, and app runs are attached first, so
+            # they are listed before the child playbook runs of the parent.
+            cached = {}
+            if include_app_runs and not pruned:
+                cached = self._get_run_index().get_children(list(pb_runs))
+
+            for entry in cached.values():
+                self._attach_app_runs(run_tree, pb_runs, entry["app_runs"])
+                level.extend(self._attach_pb_runs(run_tree, pb_runs, entry["pb_runs"]))
+
+            errors = {}
+            pages = self._iter_level(
+                [run_id for run_id in pb_runs if run_id not in cached],
+                include_app_runs,
+                app_run_params=app_run_params,
+                include_pb_runs=include_pb_runs,
+            )
+            for endpoint, chunk, (ret_val, resp) in pages:
+                if phantom.is_fail(ret_val):
+                    self._record_level_error(errors, endpoint, chunk, resp)
+                elif endpoint == "app_run":
+                    self._attach_app_runs(run_tree, pb_runs, resp)
+                else:
+                    level.extend(self._attach_pb_runs(run_tree, pb_runs, resp))
+
+                if self._truncated:
+                    pages.close()
+                    break
+
+            for run_id, messages in errors.items():
+                for message in messages:
+                    run_tree.add_error(pb_runs[run_id], message)
+
+        # A truncated or pruned tree is missing runs, so none of its playbook runs can be considered finished
+        if include_app_runs and not self._truncated and not pruned:
+            self._cache_finished_runs(run_tree, tree_pb_runs)
 
-        if include_app_runs:
-            ret_val = self._attach_app_runs(action_result, parent_pb_run)
+        return phantom.APP_SUCCESS
+
+    def _get_run_index(self):
+        """Open the run graph index on first use, so the action runs that never look up a run, like test connectivity, do not import
+        sqlite3 or open the database.
+
+        Returns:
+            RunGraphIndex: Run graph index of the app state directory
+        """
+        if self._run_index is None:
+            from playbookutils_index import RunGraphIndex
+
+            # The cached children hold the configured run fields, so assets with other run fields do not share them
+            self._run_index = RunGraphIndex(
+                os.path.join(self.get_state_dir(), PLAYBOOKUTILS_RUN_INDEX_FILE),
+                ",".join(self._run_fields) if self._run_fields else "*",
+                self._run_index_max_age,
+                self._tree_cache_max_entries,
+                self._tree_cache_max_age,
+                self._tree_cache_max_bytes,
+            )
+
+        return self._run_index
+
+    def _cache_finished_runs(self, run_tree, tree_pb_runs):
+        """Store the children of every playbook run that, like its app runs and child playbook runs, reached a terminal status in
+        the playbook tree cache, so concurrent and later action runs of the app can reuse them without fetching them again. The
+        child playbook runs may still have running descendants, which are fetched again as the children of their own playbook run.
+        Playbook runs that had errors while being expanded are not stored.
+
+        Args:
+            run_tree (RunTree): Expanded tree
+            tree_pb_runs (list): Node indexes of the playbook runs of the tree in level order
+        """
+        run_index = self._get_run_index()
+        if not run_index.children_enabled:
+            return
+
+        children = {}
+        for pb_run in tree_pb_runs:
+            if run_tree.status(pb_run) not in PLAYBOOKUTILS_TERMINAL_STATUSES or pb_run in run_tree.errors:
+                continue
+
+            child_runs = list(run_tree.children(pb_run))
+            if all(run_tree.status(child) in PLAYBOOKUTILS_TERMINAL_STATUSES for child in child_runs):
+                children[run_tree.run_id(pb_run)] = (
+                    [run_tree.details(child) for child in child_runs if run_tree.type(child) == "app"],
+                    [run_tree.details(child) for child in child_runs if run_tree.type(child) == "playbook"],
+                )
+
+        run_index.put_children(children)
+
+    def _enrich_app_runs(self, run_tree):
+        """Add the timing, result message and asset of every app run of a tree to its details, with batched `_filter_id__in` queries
+        instead of one request per app run. The chunks and their pages are fetched in parallel when concurrency is enabled.
+
+        Args:
+            run_tree (RunTree): Tree, or forest, of runs
+
+        Returns:
+            int: Number of app runs whose details could not be fetched
+        """
+        app_run_nodes = {run_tree.run_id(node): node for node in range(len(run_tree)) if run_tree.type(node) == "app"}
+        chunks = list(self._chunk_run_ids(sorted(app_run_nodes), self._max_concurrent_requests))
+        queries = [("app_run", "id", chunk, None) for chunk in chunks]
+
+        failed = 0
+        for (_, _, chunk, _), (ret_val, resp) in self._iter_queries(queries, fields=("id", *PLAYBOOKUTILS_APP_RUN_DETAIL_FIELDS)):
             if phantom.is_fail(ret_val):
-                self.debug_print(action_result.get_message())
-                action_result.set_status(phantom.APP_SUCCESS)
+                self.debug_print(f"Unable to get the details of {len(chunk)} app run(s): {resp}")
+                failed += len(chunk)
+                continue
 
-        self._attach_pb_runs(action_result, parent_pb_run, include_app_runs)
+            for app_run in resp:
+                if app_run["id"] in app_run_nodes:
+                    run_tree.update_details(app_run_nodes[app_run["id"]], app_run)
 
-        return phantom.APP_SUCCESS
+        return failed
 
     def _get_app_run(self, action_result, app_run_id):
         """Get app run information
@@ -330,48 +776,519 @@ class PlaybookUtilsConnector(BaseConnector):
 
         return RetVal(phantom.APP_SUCCESS, pb_run_resp)
 
-    def _get_run_tree(self, action_result, pb_run_id, include_app_runs=True):
-        """Get the root playbook and attach the descendants
+    def _get_parent_run_id(self, action_result, pb_run_id):
+        """Get the parent playbook run ID of a playbook run. Only the parent_run field is requested, and links that were already
+        learned during this action run, or are in the run graph index, are not requested again.
 
         Args:
             action_result (ActionResult): Action result
-            pb_run_id (int): Playbook run ID  that belongs to the tree that we are looking to get the tree
-            include_app_runs (bool): Get the app runs of the playbooks in the tree
+            pb_run_id (int): Playbook run ID to get the parent of
 
         Returns:
             RetVal:
                 bool: ActionResult status
-                PlaybookRun: Root playbook run
+                int: Parent playbook run ID, None if the playbook run is a root playbook run
         """
-        root_pb_run = None
+        if pb_run_id in self._parent_runs:
+            return RetVal(phantom.APP_SUCCESS, self._parent_runs[pb_run_id])
+
+        self._parent_runs.update(self._get_run_index().get_parents([pb_run_id]))
+        if pb_run_id in self._parent_runs:
+            return RetVal(phantom.APP_SUCCESS, self._parent_runs[pb_run_id])
+
+        ret_val, pb_run_resp = self._make_rest_call(ph_rules.build_phantom_rest_url("playbook_run", pb_run_id, "parent_run"), action_result)
+        if phantom.is_fail(ret_val):
+            return RetVal(action_result.get_status(), None)
+
+        self._parent_runs[pb_run_id] = pb_run_resp.get("parent_run")
+
+        return RetVal(phantom.APP_SUCCESS, self._parent_runs[pb_run_id])
+
+    def _get_root_pb_run_id(self, action_result, pb_run_id):
+        """Climb the parent playbook runs until the top level (or root) playbook run is found.
+
+        Args:
+            action_result (ActionResult): Action result
+            pb_run_id (int): Playbook run ID to start from
 
-        # Dive into each parent playbook, until we get the top_level (or root) playbook
-        # Limit runs during development to 25
-        for x in range(25, -1, -1):
-            if x == 0:
-                message = "Loop limit reached when trying to get to root pb"
+        Returns:
+            RetVal:
+                bool: ActionResult status
+                int: Root playbook run ID
+        """
+        ancestors = [pb_run_id]
+        while True:
+            ret_val, parent_run = self._get_parent_run_id(action_result, pb_run_id)
+            if phantom.is_fail(ret_val):
+                return RetVal(action_result.get_status(), None)
+
+            if not parent_run:
+                return RetVal(phantom.APP_SUCCESS, pb_run_id)
+
+            if parent_run in ancestors:
+                message = PLAYBOOKUTILS_PARENT_CYCLE_MSG.format(chain=" -> ".join(str(run_id) for run_id in [*ancestors, parent_run]))
                 return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
 
-            ret_val, pb_run = self._get_pb_run(action_result, pb_run_id)
+            if len(ancestors) > self._max_tree_depth:
+                return RetVal(
+                    action_result.set_status(phantom.APP_ERROR, PLAYBOOKUTILS_MAX_TREE_DEPTH_MSG.format(depth=self._max_tree_depth)), None
+                )
+
+            ancestors.append(parent_run)
+            pb_run_id = parent_run
+
+    def _get_run_tree(
+        self, action_result, pb_run_id, include_app_runs=True, scope="root", max_depth=None, app_run_params=None, details_store=None
+    ):
+        """Get the root playbook and attach the descendants
+
+        Args:
+            action_result (ActionResult): Action result
+            pb_run_id (int): Playbook run ID  that belongs to the tree that we are looking to get the tree
+            include_app_runs (bool): Get the app runs of the playbooks in the tree
+            scope (str): Start the tree from the root playbook run (root) or from the given playbook run (run)
+            max_depth (int): Number of playbook run levels to expand below the first playbook run, None to expand the whole tree
+            app_run_params (dict): Filters of the app runs to include
+            details_store (list): Store of the run details of the tree, a plain list by default
+
+        Returns:
+            RetVal:
+                bool: ActionResult status
+                RunTree: Tree of the root playbook run and its descendants
+        """
+        with self._timer.section("root_lookup"):
+            # The subtree of the given playbook run does not need its ancestors
+            root_pb_run_id = pb_run_id
+            if scope == "root":
+                ret_val, root_pb_run_id = self._get_root_pb_run_id(action_result, pb_run_id)
+                if phantom.is_fail(ret_val):
+                    return RetVal(action_result.get_status(), None)
+
+            # Only the root playbook run needs its full details, the ancestors in between were resolved with their parent_run only
+            ret_val, pb_run = self._get_pb_run(action_result, root_pb_run_id)
             if phantom.is_fail(ret_val):
                 return RetVal(action_result.get_status(), None)
 
-            parent_run = pb_run.get("parent_run")
-            if parent_run:
-                pb_run_id = parent_run
-            else:
-                root_pb_run = PlaybookRun(pb_run)
+        run_tree = RunTree(details_store)
+        root_pb_run = run_tree.add(self._project_run(pb_run), "playbook")
+        self._node_count += 1
+
+        with self._timer.section("attach_descendants"):
+            ret_val = self._attach_descendants(action_result, run_tree, [root_pb_run], include_app_runs, max_depth, app_run_params)
+        if phantom.is_fail(ret_val):
+            return RetVal(action_result.get_status(), None)
+
+        return RetVal(phantom.APP_SUCCESS, run_tree)
+
+    def _fetch_ancestors(self, action_result, pb_run_ids, pb_runs):
+        """Get the details of playbook runs and of all their ancestors, with one batched query per generation instead of one request
+        per playbook run. The parent links are remembered, so the roots can then be found without any request.
+
+        Args:
+            action_result (ActionResult): Action result
+            pb_run_ids (list): Playbook run IDs to start from
+            pb_runs (dict): Playbook run details keyed by run ID, the fetched playbook runs are added to it
+
+        Returns:
+            bool: Action result status
+        """
+        pending = sorted({run_id for run_id in pb_run_ids if run_id not in pb_runs})
+        for _ in range(self._max_tree_depth + 1):
+            if not pending:
                 break
 
-        if not root_pb_run:
-            message = "Unable to get the root Playbook run"
-            return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
+            queries = [("playbook_run", "id", chunk, None) for chunk in self._chunk_run_ids(pending)]
+            for _, (ret_val, runs) in self._iter_queries(queries):
+                if phantom.is_fail(ret_val):
+                    return action_result.set_status(phantom.APP_ERROR, f"Unable to get the playbook runs: {runs}")
+
+                for run in runs:
+                    pb_runs[run["id"]] = run
+                    self._parent_runs[run["id"]] = run.get("parent_run")
+
+            # Playbook runs that were not found are left to the root lookup, which reports them
+            pending = sorted({parent for run_id in pending if (parent := self._parent_runs.get(run_id)) and parent not in pb_runs})
+
+        return phantom.APP_SUCCESS
+
+    def _get_run_forest(self, action_result, pb_run_ids, container_id, include_app_runs=True):
+        """Get the trees of many playbook runs at once. Playbook runs that share a root are grouped in one tree, and all the trees
+        are expanded together as one forest, so each level only costs one set of batched queries for every tree.
+
+        Args:
+            action_result (ActionResult): Action result
+            pb_run_ids (list): Playbook run IDs of any playbook run in the trees
+            container_id (int): Also get the trees of every playbook run of this container, None to only use the playbook run IDs
+            include_app_runs (bool): Get the app runs of the playbooks in the trees
 
-        ret_val = self._attach_descendants(action_result, root_pb_run, include_app_runs)
+        Returns:
+            RetVal:
+                bool: ActionResult status
+                (RunTree, dict, dict): Forest of the trees, the requested playbook run IDs keyed by the node index of their root, and
+                    the error message of the playbook run IDs whose root could not be found keyed by playbook run ID
+        """
+        pb_runs = {}
+        if container_id is not None:
+            for _, (ret_val, runs) in self._iter_queries([("playbook_run", "container", [container_id], None)]):
+                if phantom.is_fail(ret_val):
+                    return RetVal(
+                        action_result.set_status(phantom.APP_ERROR, f"Unable to get the playbook runs of container {container_id}: {runs}"),
+                        (None, None, None),
+                    )
+
+                for run in runs:
+                    pb_runs[run["id"]] = run
+                    self._parent_runs[run["id"]] = run.get("parent_run")
+
+            pb_run_ids = list(dict.fromkeys([*pb_run_ids, *sorted(pb_runs)]))
+
+        ret_val = self._fetch_ancestors(action_result, pb_run_ids, pb_runs)
         if phantom.is_fail(ret_val):
-            return RetVal(action_result.get_status(), None)
+            return RetVal(action_result.get_status(), (None, None, None))
+
+        roots = {}
+        failed_runs = {}
+        for pb_run_id in pb_run_ids:
+            run_action_result = ActionResult()
+            ret_val, root_pb_run_id = self._get_root_pb_run_id(run_action_result, pb_run_id)
+            if phantom.is_success(ret_val) and root_pb_run_id not in pb_runs:
+                ret_val, pb_run = self._get_pb_run(run_action_result, root_pb_run_id)
+                if phantom.is_success(ret_val):
+                    pb_runs[root_pb_run_id] = self._project_run(pb_run)
+
+            self._query_debug_data.extend(run_action_result.get_debug_data())
+            if phantom.is_fail(ret_val):
+                failed_runs[pb_run_id] = run_action_result.get_message()
+                continue
+
+            roots.setdefault(root_pb_run_id, []).append(pb_run_id)
+
+        run_tree = RunTree()
+        root_pb_runs = {}
+        for root_pb_run_id, requested_run_ids in roots.items():
+            root_pb_runs[run_tree.add(pb_runs[root_pb_run_id], "playbook")] = requested_run_ids
+            self._node_count += 1
+
+        with self._timer.section("attach_descendants"):
+            ret_val = self._attach_descendants(action_result, run_tree, list(root_pb_runs), include_app_runs)
+        if phantom.is_fail(ret_val):
+            return RetVal(action_result.get_status(), (None, None, None))
+
+        return RetVal(phantom.APP_SUCCESS, (run_tree, root_pb_runs, failed_runs))
+
+    def _build_run_tree(self, root_pb_run_details, pb_runs, app_runs):
+        """Build a run tree from playbook run and app run details whose parents are known.
+
+        Args:
+            root_pb_run_details (dict): Root playbook run details
+            pb_runs (dict): Playbook run details keyed by run ID, the root playbook run is skipped if it is included
+            app_runs (dict): App run details keyed by run ID
+
+        Returns:
+            RunTree: Tree of the root playbook run and its descendants
+        """
+        child_pb_runs = {}
+        for pb_run in pb_runs.values():
+            if pb_run.get("parent_run"):
+                child_pb_runs.setdefault(pb_run["parent_run"], []).append(pb_run)
+
+        child_app_runs = {}
+        for app_run in app_runs.values():
+            child_app_runs.setdefault(app_run["playbook_run"], []).append(app_run)
+
+        run_tree = RunTree()
+        level = [run_tree.add(root_pb_run_details, "playbook")]
+        self._node_count += 1
+        while level:
+            pb_runs_by_id = {run_tree.run_id(pb_run): pb_run for pb_run in level}
+            self._attach_app_runs(
+                run_tree,
+                pb_runs_by_id,
+                sorted((app_run for run_id in pb_runs_by_id for app_run in child_app_runs.get(run_id, [])), key=lambda run: run["id"]),
+            )
+            level = self._attach_pb_runs(
+                run_tree,
+                pb_runs_by_id,
+                sorted((pb_run for run_id in pb_runs_by_id for pb_run in child_pb_runs.get(run_id, [])), key=lambda run: run["id"]),
+            )
+
+        return run_tree
+
+    def _save_tree_snapshot(self, run_tree, include_app_runs, root=0, since_cursor=None):
+        """Store a lightweight snapshot of the run tree in the state, so the next call can only fetch what changed since this one.
+        A tree with branches that could not be fetched is not stored, the next call starts from the previous cursor again.
+
+        Args:
+            run_tree (RunTree): Tree to store
+            include_app_runs (bool): Whether the tree includes the app runs
+            root (int): Node index of the root playbook run of the tree
+            since_cursor (str): Cursor the tree was fetched from, None if the whole tree was fetched
+
+        Returns:
+            str: Cursor to pass as since_cursor to get the changes since this tree was fetched, the previous cursor if branches are
+                missing, None if the snapshot is too large or the whole tree has missing branches
+        """
+        if any(node in run_tree.errors for node in run_tree.iter_subtree(root)):
+            self.debug_print("Branches of the playbook tree could not be fetched, keeping the previous cursor")
+            return since_cursor
+
+        pb_runs = {}
+        app_runs = {}
+        for node in run_tree.iter_subtree(root):
+            run_details = run_tree.details(node)
+            snapshot_runs = app_runs if run_tree.type(node) == "app" else pb_runs
+            snapshot_runs[str(run_tree.run_id(node))] = {
+                field: run_details[field] for field in PLAYBOOKUTILS_SNAPSHOT_FIELDS if field in run_details
+            }
+        cursor_time = self._get_cursor_time((run_tree.details(node) for node in run_tree.iter_subtree(root)), self._start_time)
+
+        # The state is loaded and saved by every action run, so a snapshot that does not fit in it is not saved
+        snapshot = {"include_app_runs": include_app_runs, "pb_runs": pb_runs, "app_runs": app_runs}
+        size = len(json.dumps(snapshot))
+        snapshots = self._state.setdefault(PLAYBOOKUTILS_SNAPSHOT_STATE_KEY, {})
+        snapshots.pop(str(run_tree.run_id(root)), None)
+        if size > PLAYBOOKUTILS_MAX_SNAPSHOT_BYTES:
+            self.debug_print(
+                f"The playbook tree snapshot of {size} bytes is larger than {PLAYBOOKUTILS_MAX_SNAPSHOT_BYTES} bytes, not saving it"
+            )
+            return None
+
+        snapshots[str(run_tree.run_id(root))] = {"saved": time.time(), "size": size, **snapshot}
+
+        return f"{run_tree.run_id(root)}:{cursor_time}"
+
+    def _prune_tree_snapshots(self):
+        """Only keep the most recently saved snapshots that fit in the maximum count and size. This runs once all the trees of the
+        action run are saved, so the cursors of the snapshots that are removed are cleared from the summaries of the action results
+        instead of being returned for a snapshot that does not exist anymore.
+        """
+        snapshots = self._state.get(PLAYBOOKUTILS_SNAPSHOT_STATE_KEY)
+        if not snapshots:
+            return
+
+        total_size = 0
+        for position, root_pb_run_id in enumerate(sorted(snapshots, key=lambda key: snapshots[key]["saved"], reverse=True)):
+            total_size += snapshots[root_pb_run_id].get("size", 0)
+            if position >= PLAYBOOKUTILS_MAX_SNAPSHOTS or total_size > PLAYBOOKUTILS_MAX_SNAPSHOT_BYTES:
+                del snapshots[root_pb_run_id]
+
+        for action_result in self.get_action_results():
+            next_cursor = (action_result.get_summary() or {}).get("next_cursor")
+            if next_cursor and next_cursor.partition(":")[0] not in snapshots:
+                self.debug_print(f"The playbook tree snapshot of cursor {next_cursor} was removed to fit in the state, not returning it")
+                action_result.update_summary({"next_cursor": None})
+
+    def _get_cursor_time(self, runs, fetch_start):
+        """Get the time after which the updated runs are fetched by the next call. The queries that fetched the runs were not sent
+        at the same time, so a run can be updated after its own query ran, but before a later query returned a run with a newer
+        update time. The newest update time is moved back by the time the queries took and a margin, so that those updates are
+        fetched again. Runs that are fetched again are only reported as changed when their status changed.
+
+        Args:
+            runs (iterable): Details of the fetched runs
+            fetch_start (float): Monotonic time before the first query was sent
+
+        Returns:
+            str: ISO 8601 cursor time, or an empty string to fetch every run when no update time is known
+        """
+        update_time = max((run.get("update_time") or "" for run in runs), default="")
+        try:
+            cursor_time = datetime.fromisoformat(update_time.replace("Z", "+00:00"))
+        except ValueError:
+            return ""
+
+        cursor_time -= timedelta(seconds=time.monotonic() - fetch_start + PLAYBOOKUTILS_CURSOR_OVERLAP)
+        return cursor_time.isoformat(timespec="microseconds").replace("+00:00", "Z")
+
+    def _get_run_tree_delta(self, action_result, since_cursor, include_app_runs):
+        """Get the run tree using the snapshot of a previous call, only fetching the playbook runs and app runs that were updated
+        since the cursor. If there is no snapshot for the cursor, the whole tree is fetched and every run is considered changed.
+
+        Args:
+            action_result (ActionResult): Action result
+            since_cursor (str): Cursor returned by a previous call
+            include_app_runs (bool): Get the app runs of the playbooks in the tree
+
+        Returns:
+            RetVal:
+                bool: ActionResult status
+                (RunTree, set): Run tree and the (type, run ID) of every run added or changed since the cursor
+        """
+        root_pb_run_id, _, cursor_time = str(since_cursor).partition(":")
+        try:
+            root_pb_run_id = int(root_pb_run_id)
+        except ValueError:
+            return RetVal(
+                action_result.set_status(phantom.APP_ERROR, PLAYBOOKUTILS_INVALID_CURSOR_MSG.format(cursor=since_cursor)), (None, None)
+            )
+
+        snapshot = self._state.get(PLAYBOOKUTILS_SNAPSHOT_STATE_KEY, {}).get(str(root_pb_run_id))
+        if not snapshot or not cursor_time or snapshot["include_app_runs"] != include_app_runs:
+            self.debug_print(f"No playbook tree snapshot for cursor {since_cursor}, getting the whole tree")
+            ret_val, run_tree = self._get_run_tree(action_result, root_pb_run_id, include_app_runs)
+            if phantom.is_fail(ret_val):
+                return RetVal(action_result.get_status(), (None, None))
+
+            return RetVal(phantom.APP_SUCCESS, (run_tree, {(run_tree.type(node), run_tree.run_id(node)) for node in range(len(run_tree))}))
+
+        pb_runs = {int(run_id): run for run_id, run in snapshot["pb_runs"].items()}
+        app_runs = {int(run_id): run for run_id, run in snapshot["app_runs"].items()}
+        changed_runs = set()
+
+        ret_val, root_pb_run_details = self._get_pb_run(action_result, root_pb_run_id)
+        if phantom.is_fail(ret_val):
+            return RetVal(action_result.get_status(), (None, None))
+
+        root_pb_run_details = self._project_run(root_pb_run_details)
+        if root_pb_run_details.get("status") != pb_runs.get(root_pb_run_id, {}).get("status"):
+            changed_runs.add(("playbook", root_pb_run_id))
+        pb_runs[root_pb_run_id] = root_pb_run_details
 
-        return RetVal(phantom.APP_SUCCESS, root_pb_run)
+        # Every known playbook run is checked for updated children once, then only the new playbook runs are expanded further
+        errors = {}
+        self._fetch_updated_runs(list(pb_runs), pb_runs, app_runs, include_app_runs, cursor_time, changed_runs, errors)
+
+        run_tree = self._build_run_tree(root_pb_run_details, pb_runs, app_runs)
+        for node in range(len(run_tree)):
+            for message in errors.get(run_tree.run_id(node), []) if run_tree.type(node) == "playbook" else []:
+                run_tree.add_error(node, message)
+
+        return RetVal(phantom.APP_SUCCESS, (run_tree, changed_runs))
+
+    def _fetch_updated_runs(self, level, pb_runs, app_runs, include_app_runs, cursor_time, changed_runs, errors):
+        """Fetch the children of playbook runs that were added or updated since a time, then expand the new child playbook runs
+        the same way until no new playbook run is found.
+
+        Args:
+            level (list): Playbook run IDs whose children are checked
+            pb_runs (dict): Known playbook run details keyed by run ID, updated with the fetched playbook runs
+            app_runs (dict): Known app run details keyed by run ID, updated with the fetched app runs
+            include_app_runs (bool): Fetch the app runs of the playbook runs
+            cursor_time (str): Only fetch the runs updated after this time, None fetches every child
+            changed_runs (set): The (type, run ID) of the runs that are new or changed status are added to it
+            errors (dict): Error messages keyed by the playbook run ID whose descendants could not be fetched, updated in place
+        """
+        updated_since = {"_filter_update_time__gt": f'"{cursor_time}"'} if cursor_time else None
+        while level:
+            updated_app_runs, updated_pb_runs, level_errors = self._fetch_level(level, include_app_runs, updated_since)
+            errors.update(level_errors)
+
+            for app_run in updated_app_runs:
+                if app_run.get("status") != app_runs.get(app_run["id"], {}).get("status"):
+                    changed_runs.add(("app", app_run["id"]))
+                app_runs[app_run["id"]] = app_run
+
+            level = []
+            for pb_run in updated_pb_runs:
+                if pb_run["id"] not in pb_runs:
+                    level.append(pb_run["id"])
+                if pb_run.get("status") != pb_runs.get(pb_run["id"], {}).get("status"):
+                    changed_runs.add(("playbook", pb_run["id"]))
+                pb_runs[pb_run["id"]] = pb_run
+
+    def _wait_for_run_tree(self, action_result, pb_run_id, include_app_runs, timeout, poll_interval):
+        """Wait until every run of the tree of a playbook run reaches a terminal status. The whole tree is fetched once, then each poll
+        fetches the runs that are not terminal by ID, and the children of the playbook runs that were not terminal that were added
+        or updated since the previous poll. The descendants of the playbook runs that could not be fetched are fetched again in
+        full. The poll interval doubles while nothing changes, up to a maximum, and goes back to the initial interval once a run
+        changes.
+
+        Args:
+            action_result (ActionResult): Action result
+            pb_run_id (int): Playbook run ID the tree starts from
+            include_app_runs (bool): Wait for the app runs of the playbook runs too
+            timeout (int): Maximum time to wait in seconds
+            poll_interval (int): Initial time between two polls in seconds
+
+        Returns:
+            RetVal:
+                bool: ActionResult status
+                (RunTree, int, float): Final run tree, number of polls, and seconds until the tree finished, None on timeout
+        """
+        start = time.monotonic()
+        ret_val, run_tree = self._get_run_tree(action_result, pb_run_id, include_app_runs, scope="run")
+        if phantom.is_fail(ret_val):
+            return RetVal(action_result.get_status(), (None, 0, None))
+
+        root_pb_run_details = run_tree.details(0)
+        pb_runs = {}
+        app_runs = {}
+        for node in range(1, len(run_tree)):
+            (app_runs if run_tree.type(node) == "app" else pb_runs)[run_tree.run_id(node)] = run_tree.details(node)
+        errors = {run_tree.run_id(node): messages for node, messages in run_tree.errors.items()}
+        cursor_time = self._get_cursor_time([root_pb_run_details, *pb_runs.values(), *app_runs.values()], start)
+
+        polls = 0
+        interval = poll_interval
+        time_to_completion = None
+        while True:
+            running_pb_runs = {run_id for run_id, run in pb_runs.items() if run.get("status") not in PLAYBOOKUTILS_TERMINAL_STATUSES}
+            running_app_runs = [run for run in app_runs.values() if run.get("status") not in PLAYBOOKUTILS_TERMINAL_STATUSES]
+            root_running = root_pb_run_details.get("status") not in PLAYBOOKUTILS_TERMINAL_STATUSES
+            if not (running_pb_runs or running_app_runs or root_running or errors):
+                time_to_completion = time.monotonic() - start
+                break
+
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+
+            time.sleep(min(interval, remaining))
+            polls += 1
+            poll_start = time.monotonic()
+
+            # Only the playbook runs that were not terminal can have new children
+            level = set(running_pb_runs)
+            changed_runs = set()
+            if root_running:
+                ret_val, pb_run = self._get_pb_run(action_result, root_pb_run_details["id"])
+                if phantom.is_fail(ret_val):
+                    return RetVal(action_result.get_status(), (None, polls, None))
+                pb_run = self._project_run(pb_run)
+                if pb_run.get("status") != root_pb_run_details.get("status"):
+                    changed_runs.add(("playbook", pb_run["id"]))
+                root_pb_run_details = pb_run
+                # The root playbook run is not in pb_runs, its new children are only found by querying it
+                level.add(pb_run["id"])
+
+            # The runs that can still change are fetched by ID, so no status change is missed by the update time cursor
+            queries = [
+                ("playbook_run", "id", chunk, None) for chunk in self._chunk_run_ids(sorted(running_pb_runs), self._max_concurrent_requests)
+            ]
+            queries += [
+                ("app_run", "id", chunk, None)
+                for chunk in self._chunk_run_ids(sorted(run["id"] for run in running_app_runs), self._max_concurrent_requests)
+            ]
+            for (endpoint, _, chunk, _), (ret_val, runs) in self._iter_queries(queries):
+                if phantom.is_fail(ret_val):
+                    # The runs keep their last status, so they are fetched again by the next poll
+                    self.debug_print(f"Unable to get the status of {len(chunk)} {endpoint}(s): {runs}")
+                    continue
+
+                known_runs = app_runs if endpoint == "app_run" else pb_runs
+                for run in runs:
+                    if run.get("status") != known_runs.get(run["id"], {}).get("status"):
+                        changed_runs.add(("app" if endpoint == "app_run" else "playbook", run["id"]))
+                    known_runs[run["id"]] = run
+
+            # Playbook runs whose descendants could not be fetched are fetched again in full
+            failed_pb_runs = list(errors)
+            errors = {}
+            self._fetch_updated_runs(failed_pb_runs, pb_runs, app_runs, include_app_runs, None, changed_runs, errors)
+            level = sorted(run_id for run_id in level if run_id not in failed_pb_runs)
+            self._fetch_updated_runs(level, pb_runs, app_runs, include_app_runs, cursor_time, changed_runs, errors)
+            cursor_time = self._get_cursor_time([root_pb_run_details, *pb_runs.values(), *app_runs.values()], poll_start)
+
+            interval = poll_interval if changed_runs else min(interval * 2, max(PLAYBOOKUTILS_MAX_POLL_INTERVAL, poll_interval))
+
+        # Nodes were already counted when the tree was first fetched
+        self._node_count = 0
+        run_tree = self._build_run_tree(root_pb_run_details, pb_runs, app_runs)
+        for node in range(len(run_tree)):
+            for message in errors.get(run_tree.run_id(node), []) if run_tree.type(node) == "playbook" else []:
+                run_tree.add_error(node, message)
+
+        return RetVal(phantom.APP_SUCCESS, (run_tree, polls, time_to_completion))
 
     def _handle_test_connectivity(self, param):
         # Add an action result object to self (BaseConnector) to represent the action for this param
@@ -404,53 +1321,415 @@ class PlaybookUtilsConnector(BaseConnector):
 
         pb_run_id = param.get("playbook_run_id")
         include_app_runs = param.get("include_app_runs", True)
+        since_cursor = param.get("since_cursor")
+        # Polling with a cursor keeps tracking the changes
+        track_changes = param.get("track_changes", False) or bool(since_cursor)
+        output_mode = param.get("output_mode", PLAYBOOKUTILS_DEFAULT_OUTPUT_MODE)
+        if output_mode not in PLAYBOOKUTILS_OUTPUT_MODES:
+            return action_result.set_status(
+                phantom.APP_ERROR, PLAYBOOKUTILS_INVALID_OUTPUT_MODE_MSG.format(modes=", ".join(PLAYBOOKUTILS_OUTPUT_MODES))
+            )
+
+        scope = param.get("scope", PLAYBOOKUTILS_DEFAULT_SCOPE)
+        if scope not in PLAYBOOKUTILS_SCOPES:
+            return action_result.set_status(phantom.APP_ERROR, PLAYBOOKUTILS_INVALID_SCOPE_MSG.format(scopes=", ".join(PLAYBOOKUTILS_SCOPES)))
+
+        max_depth = param.get("max_depth")
+        if max_depth is not None:
+            ret_val, max_depth = self._validate_integer(action_result, max_depth, "max_depth", allow_zero=True)
+            if phantom.is_fail(ret_val):
+                return action_result.get_status()
+
+        app_run_params = self._get_app_run_filters(param)
+        pruned = scope != "root" or max_depth is not None or bool(app_run_params)
+        if track_changes and pruned:
+            return action_result.set_status(phantom.APP_ERROR, PLAYBOOKUTILS_PRUNED_CURSOR_MSG)
+
+        # All runs are returned, unless only the changes since a previous call are requested
+        changed_runs = None
+        with self._timer.section("get_run_tree"):
+            if since_cursor:
+                ret_val, (run_tree, changed_runs) = self._get_run_tree_delta(action_result, since_cursor, include_app_runs)
+                if phantom.is_fail(ret_val):
+                    return action_result.get_status()
+            else:
+                # If it isn't provided, use the current app_run to get the PB Run ID
+                if not pb_run_id:
+                    ret_val, pb_run_id = self._determine_pb_run_id(action_result)
+                    if phantom.is_fail(ret_val):
+                        return action_result.get_status()
+
+                ret_val, run_tree = self._get_run_tree(action_result, pb_run_id, include_app_runs, scope, max_depth, app_run_params)
+                if phantom.is_fail(ret_val):
+                    return action_result.get_status()
+
+        if include_app_runs and param.get("enrich_app_runs", False):
+            with self._timer.section("enrich_app_runs"):
+                action_result.update_summary({"enrichment_failures": self._enrich_app_runs(run_tree)})
+
+        with self._timer.section("output"):
+            ret_val = self._add_tree_output(
+                action_result, run_tree, 0, include_app_runs, changed_runs, output_mode, save_snapshot=track_changes, since_cursor=since_cursor
+            )
+
+        self._report_timing([action_result], len(run_tree))
+
+        return ret_val
+
+    def _handle_export_playbook_tree(self, param):
+        self.save_progress(f"In action handler for: {self.get_action_identifier()}")
+
+        # Add an action result object to self (BaseConnector) to represent the action for this param
+        action_result = self.add_action_result(ActionResult(dict(param)))
+
+        pb_run_id = param.get("playbook_run_id")
+        include_app_runs = param.get("include_app_runs", True)
+        scope = param.get("scope", PLAYBOOKUTILS_DEFAULT_SCOPE)
+        if scope not in PLAYBOOKUTILS_SCOPES:
+            return action_result.set_status(phantom.APP_ERROR, PLAYBOOKUTILS_INVALID_SCOPE_MSG.format(scopes=", ".join(PLAYBOOKUTILS_SCOPES)))
 
-        # If it isn't provided, use the current app_run to get the PB Run ID
-        if not pb_run_id:
-            ret_val, pb_run_id = self._determine_pb_run_id(action_result)
+        max_depth = param.get("max_depth")
+        if max_depth is not None:
+            ret_val, max_depth = self._validate_integer(action_result, max_depth, "max_depth", allow_zero=True)
             if phantom.is_fail(ret_val):
                 return action_result.get_status()
 
-        ret_val, run_tree = self._get_run_tree(action_result, pb_run_id, include_app_runs)
+        return self._export_playbook_tree(action_result, pb_run_id, include_app_runs, scope, max_depth, self._get_app_run_filters(param))
+
+    def _export_playbook_tree(self, action_result, pb_run_id, include_app_runs, scope, max_depth, app_run_params):
+        """Export a playbook tree with every field of its runs to a gzip compressed NDJSON file in the container vault. The run details
+        are spilled to a temporary file as the runs are attached, and the export is written from it in pre-order, so the details are
+        never all held in memory. Only the vault ID, the run counts and the statistics are added to the action result.
+
+        Args:
+            action_result (ActionResult): Action result
+            pb_run_id (int): Playbook run ID that belongs to the tree, None to use the playbook run of the current app run
+            include_app_runs (bool): Export the app runs of the playbook runs
+            scope (str): Start the tree from the root playbook run (root) or from the given playbook run (run)
+            max_depth (int): Number of playbook run levels to expand below the first playbook run, None to expand the whole tree
+            app_run_params (dict): Filters of the app runs to include
+
+        Returns:
+            bool: Action result status
+        """
+        from phantom.vault import Vault
+
+        from playbookutils_export import SpilledDetails, write_tree_export
+
+        # The export holds every field of the runs, which the cached children do not have, so only the parent links of the run graph
+        # index are used. The index is opened on first use, after these settings.
+        self._run_fields = None
+        self._tree_cache_max_entries = 0
+
+        details = SpilledDetails()
+        export_fd, export_path = tempfile.mkstemp(suffix=".ndjson.gz", dir=Vault.get_vault_tmp_dir())
+        os.close(export_fd)
+        try:
+            with self._timer.section("get_run_tree"):
+                if not pb_run_id:
+                    ret_val, pb_run_id = self._determine_pb_run_id(action_result)
+                    if phantom.is_fail(ret_val):
+                        return action_result.get_status()
+
+                ret_val, run_tree = self._get_run_tree(action_result, pb_run_id, include_app_runs, scope, max_depth, app_run_params, details)
+                if phantom.is_fail(ret_val):
+                    return action_result.get_status()
+
+            with self._timer.section("output"):
+                stats = TreeStats(run_tree)
+                counts = write_tree_export(run_tree, 0, export_path, stats)
+
+                file_name = PLAYBOOKUTILS_EXPORT_FILE_NAME.format(run_id=run_tree.run_id(0))
+                success, message, vault_id = ph_rules.vault_add(
+                    container=self.get_container_id(), file_location=export_path, file_name=file_name
+                )
+                if not success:
+                    return action_result.set_status(phantom.APP_ERROR, PLAYBOOKUTILS_VAULT_ADD_MSG.format(message=message))
+        finally:
+            details.close()
+            if os.path.exists(export_path):
+                os.remove(export_path)
+
+        action_result.update_summary(
+            {
+                "vault_id": vault_id,
+                "file_name": file_name,
+                "playbook_run_count": counts["playbook"],
+                "app_run_count": counts["app"],
+                "stats": stats.summary(),
+                "truncated": self._truncated,
+                "retried_requests": self._scheduler.retried,
+                "dropped_branches": len(run_tree.errors),
+            }
+        )
+        self._report_timing([action_result], len(run_tree))
+
+        return action_result.set_status(
+            phantom.APP_SUCCESS, f"Exported {counts['playbook']} playbook run(s) and {counts['app']} app run(s) to the vault as {file_name}"
+        )
+
+    def _handle_get_playbook_trees(self, param):
+        self.save_progress(f"In action handler for: {self.get_action_identifier()}")
+
+        include_app_runs = param.get("include_app_runs", True)
+        container_id = param.get("container_id")
+        track_changes = param.get("track_changes", False)
+        output_mode = param.get("output_mode", PLAYBOOKUTILS_DEFAULT_OUTPUT_MODE)
+
+        # Errors that happen before the trees are split into one action result per root are reported in a single action result
+        action_result = ActionResult(dict(param))
+
+        if output_mode not in PLAYBOOKUTILS_OUTPUT_MODES:
+            return self.add_action_result(action_result).set_status(
+                phantom.APP_ERROR, PLAYBOOKUTILS_INVALID_OUTPUT_MODE_MSG.format(modes=", ".join(PLAYBOOKUTILS_OUTPUT_MODES))
+            )
+
+        ret_val, pb_run_ids = self._parse_run_ids(action_result, param.get("playbook_run_ids"))
+        if phantom.is_fail(ret_val):
+            return self.add_action_result(action_result).get_status()
+
+        if container_id is not None:
+            ret_val, container_id = self._validate_integer(action_result, container_id, "container_id", allow_zero=True)
+            if phantom.is_fail(ret_val):
+                return self.add_action_result(action_result).get_status()
+
+        if not pb_run_ids and container_id is None:
+            return self.add_action_result(action_result).set_status(phantom.APP_ERROR, PLAYBOOKUTILS_NO_PLAYBOOK_RUNS_MSG)
+
+        with self._timer.section("get_run_tree"):
+            ret_val, (run_tree, roots, failed_runs) = self._get_run_forest(action_result, pb_run_ids, container_id, include_app_runs)
+            if phantom.is_fail(ret_val):
+                return self.add_action_result(action_result).get_status()
+
+        if not roots and not failed_runs:
+            return self.add_action_result(action_result).set_status(phantom.APP_SUCCESS, "No playbook runs found")
+
+        action_results = []
+        with self._timer.section("output"):
+            for root, requested_run_ids in roots.items():
+                root_action_result = self.add_action_result(ActionResult(dict(param)))
+                root_action_result.update_summary(
+                    {"root_playbook_run_id": run_tree.run_id(root), "requested_playbook_run_ids": requested_run_ids}
+                )
+                self._add_tree_output(root_action_result, run_tree, root, include_app_runs, output_mode=output_mode, save_snapshot=track_changes)
+                action_results.append(root_action_result)
+
+        for pb_run_id, message in failed_runs.items():
+            failed_action_result = self.add_action_result(ActionResult(dict(param)))
+            failed_action_result.update_summary({"requested_playbook_run_ids": [pb_run_id]})
+            failed_action_result.set_status(phantom.APP_ERROR, message)
+
+        self._report_timing(action_results, len(run_tree))
+
+        return phantom.APP_SUCCESS if roots else phantom.APP_ERROR
+
+    def _get_app_run_filters(self, param):
+        """Build the app run query filters of the app_run_status and app_name parameters.
+
+        Args:
+            param (dict): Action parameters
+
+        Returns:
+            dict: Query parameters filtering the app runs, empty when no filter is given
+        """
+        filters = {}
+        for parameter, field in (("app_run_status", "status"), ("app_name", "app_name")):
+            values = [value.strip() for value in str(param.get(parameter) or "").split(",") if value.strip()]
+            if values:
+                filters[f"_filter_{field}__in"] = json.dumps(values)
+
+        return filters
+
+    def _parse_run_ids(self, action_result, run_ids):
+        """Parse a comma-separated list of playbook run IDs.
+
+        Args:
+            action_result (ActionResult): Action result
+            run_ids (str): Comma-separated playbook run IDs, may be empty
+
+        Returns:
+            RetVal:
+                bool: ActionResult status
+                list: Playbook run IDs without duplicates, in the order they were given
+        """
+        parsed = []
+        for run_id in str(run_ids or "").split(","):
+            if not run_id.strip():
+                continue
+            ret_val, run_id = self._validate_integer(action_result, run_id.strip(), "playbook_run_ids")
+            if phantom.is_fail(ret_val):
+                return RetVal(action_result.get_status(), None)
+            parsed.append(run_id)
+
+        return RetVal(phantom.APP_SUCCESS, list(dict.fromkeys(parsed)))
+
+    def _handle_wait_for_playbook_tree(self, param):
+        self.save_progress(f"In action handler for: {self.get_action_identifier()}")
+
+        # Add an action result object to self (BaseConnector) to represent the action for this param
+        action_result = self.add_action_result(ActionResult(dict(param)))
+
+        include_app_runs = param.get("include_app_runs", True)
+        output_mode = param.get("output_mode", PLAYBOOKUTILS_DEFAULT_WAIT_OUTPUT_MODE)
+        if output_mode not in PLAYBOOKUTILS_OUTPUT_MODES:
+            return action_result.set_status(
+                phantom.APP_ERROR, PLAYBOOKUTILS_INVALID_OUTPUT_MODE_MSG.format(modes=", ".join(PLAYBOOKUTILS_OUTPUT_MODES))
+            )
+
+        ret_val, pb_run_id = self._validate_integer(action_result, param.get("playbook_run_id"), "playbook_run_id")
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        ret_val, timeout = self._validate_integer(action_result, param.get("timeout", PLAYBOOKUTILS_DEFAULT_WAIT_TIMEOUT), "timeout")
         if phantom.is_fail(ret_val):
             return action_result.get_status()
 
-        exporter = DictExporter()
+        ret_val, poll_interval = self._validate_integer(
+            action_result, param.get("poll_interval", PLAYBOOKUTILS_DEFAULT_POLL_INTERVAL), "poll_interval"
+        )
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        with self._timer.section("get_run_tree"):
+            ret_val, (run_tree, polls, time_to_completion) = self._wait_for_run_tree(
+                action_result, pb_run_id, include_app_runs, timeout, poll_interval
+            )
+            if phantom.is_fail(ret_val):
+                return action_result.get_status()
+
+        with self._timer.section("output"):
+            ret_val = self._add_tree_output(action_result, run_tree, 0, include_app_runs, output_mode=output_mode)
+
+        action_result.update_summary({"completed": time_to_completion is not None, "time_to_completion": time_to_completion, "polls": polls})
+        self._report_timing([action_result], len(run_tree))
+
+        if time_to_completion is None:
+            running_runs = sum(1 for node in range(len(run_tree)) if run_tree.status(node) not in PLAYBOOKUTILS_TERMINAL_STATUSES)
+            return action_result.set_status(
+                phantom.APP_ERROR, PLAYBOOKUTILS_WAIT_TIMEOUT_MSG.format(timeout=timeout, count=running_runs, polls=polls)
+            )
+
+        return action_result.set_status(phantom.APP_SUCCESS, f"{action_result.get_message()} The tree finished after {time_to_completion:.1f}s.")
 
+    def _add_tree_output(
+        self, action_result, run_tree, root, include_app_runs, changed_runs=None, output_mode="full", save_snapshot=False, since_cursor=None
+    ):
+        """Add the runs of one tree to an action result, with the rendered tree, run IDs and aggregate statistics in the summary. The
+        statistics are collected in the same walk of the tree as the output. Only the parts of the output used by the output mode
+        are built:
+
+        - full: one data row per run with its details, the rendered tree, run IDs and statistics
+        - compact: one data row per run with its type, run ID, parent run ID and status, the run IDs and statistics
+        - summary: the run IDs and statistics only
+        - rendered: the rendered tree, without the run IDs and statistics
+
+        Args:
+            action_result (ActionResult): Action result to add the tree to
+            run_tree (RunTree): Tree, or forest, of runs
+            root (int): Node index of the root playbook run of the tree
+            include_app_runs (bool): Whether the tree includes the app runs
+            changed_runs (set): Only add the data of these (type, run ID), None adds every run
+            output_mode (str): Output mode, one of full, compact, summary or rendered
+            save_snapshot (bool): Save a snapshot of the tree in the state and return its cursor in next_cursor, not for pruned trees
+            since_cursor (str): Cursor the tree was fetched from, None if the whole tree was fetched
+
+        Returns:
+            bool: Action result status
+        """
         summary = action_result.update_summary({})
         rendered_tree_list = []
         pb_run_ids = []
         app_run_ids = []
-        for pre, fill, node in RenderTree(run_tree):
-            # Replace space with a figure space to not get chopped down in action_results UI
-            pre = pre.replace(" ", "\u2007")
-            fill = fill.replace(" ", "\u2007")
-
+        dropped_branches = 0
+        stats = TreeStats(run_tree) if output_mode != "rendered" else None
+        add_data = output_mode in ("full", "compact")
+
+        if output_mode == "full":
+            nodes = run_tree.iter_output(root)
+        elif output_mode == "rendered":
+            nodes = ((node, None, rendered_line) for node, rendered_line in run_tree.iter_lines(root))
+        else:
+            nodes = ((node, None, None) for node in run_tree.iter_subtree(root))
+
+        for node, data, rendered_line in nodes:
+            run_type = run_tree.type(node)
+            run_id = run_tree.run_id(node)
+            if stats:
+                stats.add(node)
             # Add each node into data
-            data = exporter.export(node)
-            data["tree_prefix"] = pre
-            data["tree_fill"] = fill
-            if "children" in data:
-                del data["children"]
-            action_result.add_data(data)
+            if add_data and (changed_runs is None or (run_type, run_id) in changed_runs):
+                if data is None:
+                    parent = run_tree.parent(node)
+                    data = {
+                        "type": run_type,
+                        "run_id": run_id,
+                        "parent_run_id": run_tree.run_id(parent) if parent >= 0 else None,
+                        "status": run_tree.status(node),
+                    }
+                action_result.add_data(data)
 
             # Create text representation of tree view
-            if node.type == "app":
-                rendered_tree_list.append(f"{pre}<{node.type}-{node.run_id}> {node.action} [{node.status}]")
-                app_run_ids.append(node.run_id)
+            if rendered_line is not None:
+                rendered_tree_list.append(rendered_line)
+            if run_type == "app":
+                app_run_ids.append(run_id)
             else:
-                rendered_tree_list.append(f"{pre}<{node.type}-{node.run_id}> {node.name}")
-                pb_run_ids.append(node.run_id)
-
-        summary["rendered_playbook_tree"] = rendered_tree_list
-        summary["playbook_run_ids"] = sorted(pb_run_ids)
+                pb_run_ids.append(run_id)
+            if node in run_tree.errors:
+                dropped_branches += 1
+
+        if output_mode in ("full", "rendered"):
+            summary["rendered_playbook_tree"] = rendered_tree_list
+        summary["cache_hits"] = self._run_index.hits if self._run_index else 0
+        summary["cache_misses"] = self._run_index.misses if self._run_index else 0
+        if stats:
+            summary["playbook_run_ids"] = sorted(pb_run_ids)
+            summary["stats"] = stats.summary()
+
+        summary["next_cursor"] = self._save_tree_snapshot(run_tree, include_app_runs, root, since_cursor) if save_snapshot else None
+        summary["truncated"] = self._truncated
+        summary["retried_requests"] = self._scheduler.retried
+        # Playbook runs whose children could not be fetched, their subtrees are missing from the tree
+        summary["dropped_branches"] = dropped_branches
 
         app_run_message = ""
         if include_app_runs:
-            summary["app_run_ids"] = sorted(app_run_ids)
+            if stats:
+                summary["app_run_ids"] = sorted(app_run_ids)
             app_run_message = f" and {len(app_run_ids)} app run(s)"
 
-        return action_result.set_status(phantom.APP_SUCCESS, f"Found {len(pb_run_ids)} playbook run(s){app_run_message}.")
+        changed_message = ""
+        if changed_runs is not None:
+            summary["changed_run_count"] = len(changed_runs)
+            changed_message = f" {len(changed_runs)} run(s) changed since the cursor."
+
+        truncated_message = ""
+        if self._truncated:
+            truncated_message = f" The tree was truncated after {self._max_nodes} run(s)."
+        if dropped_branches:
+            truncated_message += f" The descendants of {dropped_branches} playbook run(s) could not be fetched."
+
+        return action_result.set_status(
+            phantom.APP_SUCCESS, f"Found {len(pb_run_ids)} playbook run(s){app_run_message}.{changed_message}{truncated_message}"
+        )
+
+    def _report_timing(self, action_results, node_count):
+        """Add the timings of the action run to the summary of its action results, and to the debug log, when they are enabled.
+
+        Args:
+            action_results (list): Action results to add the timings to
+            node_count (int): Number of runs fetched by the action run
+        """
+        if not self._timer.enabled:
+            return
+
+        timing = self._timer.report(node_count, "get_run_tree")
+        if self._enable_timing:
+            for action_result in action_results:
+                action_result.update_summary({"timing": timing})
+        if self._log_timing:
+            # One structured line, so the timings of many action runs can be extracted from the debug log
+            self.debug_print(f"playbook_tree_timing {json.dumps(timing, sort_keys=True)}")
 
     def handle_action(self, param):
         # Get the action that we are supposed to execute for this App Run
@@ -458,17 +1737,39 @@ class PlaybookUtilsConnector(BaseConnector):
 
         self.debug_print("action_id", action_id)
 
-        action_map = {"test_connectivity": self._handle_test_connectivity, "get_playbook_tree": self._handle_get_playbook_tree}
+        action_map = {
+            "test_connectivity": self._handle_test_connectivity,
+            "get_playbook_tree": self._handle_get_playbook_tree,
+            "get_playbook_trees": self._handle_get_playbook_trees,
+            "export_playbook_tree": self._handle_export_playbook_tree,
+            "wait_for_playbook_tree": self._handle_wait_for_playbook_tree,
+        }
 
         if action_id not in action_map:
             return self.set_status(phantom.APP_ERROR, "Action identifier is not available.")
 
-        return action_map[action_id](param)
+        ret_val = action_map[action_id](param)
+        self._prune_tree_snapshots()
+        self._add_query_debug_data()
+
+        return ret_val
+
+    def _add_query_debug_data(self):
+        """Add the debug data captured by the queries that used their own action result, like the failed queries of a tree level, to
+        the first action result of the action run, so it is not lost with their action results.
+        """
+        action_results = self.get_action_results()
+        if self._query_debug_data and action_results:
+            for debug_data in self._query_debug_data:
+                action_results[0].add_debug_data(debug_data)
+        self._query_debug_data = []
 
     def initialize(self):
+        self._start_time = time.monotonic()
+
         # Load the state in initialize, use it to store data
         # that needs to be accessed across actions
-        self._state = self.load_state()
+        self._state = self.load_state() or {}
 
         # get the asset config
         config = self.get_config()
@@ -484,9 +1785,127 @@ class PlaybookUtilsConnector(BaseConnector):
 
         self._base_url = config.get("base_url")
 
+        ret_val, self._max_concurrent_requests = self._validate_integer(
+            self, config.get("max_concurrent_requests", PLAYBOOKUTILS_DEFAULT_MAX_CONCURRENT_REQUESTS), "max_concurrent_requests"
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._max_tree_depth = self._validate_integer(
+            self, config.get("max_tree_depth", PLAYBOOKUTILS_DEFAULT_MAX_TREE_DEPTH), "max_tree_depth"
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._tree_cache_max_entries = self._validate_integer(
+            self, config.get("tree_cache_max_entries", PLAYBOOKUTILS_DEFAULT_TREE_CACHE_MAX_ENTRIES), "tree_cache_max_entries", allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._tree_cache_max_age = self._validate_integer(
+            self, config.get("tree_cache_max_age", PLAYBOOKUTILS_DEFAULT_TREE_CACHE_MAX_AGE), "tree_cache_max_age"
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._tree_cache_max_bytes = self._validate_integer(
+            self, config.get("tree_cache_max_bytes", PLAYBOOKUTILS_DEFAULT_TREE_CACHE_MAX_BYTES), "tree_cache_max_bytes", allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._page_size = self._validate_integer(
+            self, config.get("page_size", PLAYBOOKUTILS_DEFAULT_PAGE_SIZE), "page_size", allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        run_fields = config.get("run_fields", PLAYBOOKUTILS_DEFAULT_RUN_FIELDS).strip()
+        if run_fields != "*":
+            # The fields used to build and expand the tree are always kept
+            fields = [field.strip() for field in run_fields.split(",") if field.strip()]
+            self._run_fields = tuple(dict.fromkeys([*PLAYBOOKUTILS_REQUIRED_RUN_FIELDS, *fields]))
+
+        ret_val, self._run_index_max_age = self._validate_integer(
+            self, config.get("run_index_max_age", PLAYBOOKUTILS_DEFAULT_RUN_INDEX_MAX_AGE), "run_index_max_age", allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._max_nodes = self._validate_integer(
+            self, config.get("max_nodes", PLAYBOOKUTILS_DEFAULT_MAX_NODES), "max_nodes", allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        self._debug_capture = config.get("debug_capture", PLAYBOOKUTILS_DEFAULT_DEBUG_CAPTURE)
+        if self._debug_capture not in PLAYBOOKUTILS_DEBUG_CAPTURE_POLICIES:
+            return self.set_status(
+                phantom.APP_ERROR,
+                PLAYBOOKUTILS_INVALID_DEBUG_CAPTURE_MSG.format(policies=", ".join(PLAYBOOKUTILS_DEBUG_CAPTURE_POLICIES)),
+            )
+
+        ret_val, self._debug_capture_bytes = self._validate_integer(
+            self, config.get("debug_capture_bytes", PLAYBOOKUTILS_DEFAULT_DEBUG_CAPTURE_BYTES), "debug_capture_bytes"
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._request_timeout = self._validate_integer(
+            self, config.get("request_timeout", PLAYBOOKUTILS_DEFAULT_REQUEST_TIMEOUT), "request_timeout"
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, max_retries = self._validate_integer(
+            self, config.get("max_retries", PLAYBOOKUTILS_DEFAULT_MAX_RETRIES), "max_retries", allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, retry_backoff_ms = self._validate_integer(
+            self, config.get("retry_backoff_ms", PLAYBOOKUTILS_DEFAULT_RETRY_BACKOFF_MS), "retry_backoff_ms"
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, max_requests_per_second = self._validate_integer(
+            self,
+            config.get("max_requests_per_second", PLAYBOOKUTILS_DEFAULT_MAX_REQUESTS_PER_SECOND),
+            "max_requests_per_second",
+            allow_zero=True,
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        self._scheduler = RequestScheduler(
+            max_retries,
+            retry_backoff_ms / 1000,
+            PLAYBOOKUTILS_MAX_RETRY_DELAY,
+            PLAYBOOKUTILS_RETRY_STATUS_CODES,
+            max_requests_per_second,
+            os.path.join(self.get_state_dir(), PLAYBOOKUTILS_RATE_LIMIT_FILE),
+        )
+
+        # Timings are only recorded when they are added to the summary or logged
+        self._enable_timing = config.get("enable_timing", False)
+        self._log_timing = config.get("log_timing", False)
+        self._timer = ActionTimer(self._enable_timing or self._log_timing)
+
         return phantom.APP_SUCCESS
 
     def finalize(self):
+        if self._parent_runs:
+            self._get_run_index().put_parents(self._parent_runs)
+
+        if self._run_index:
+            self._run_index.expire()
+            if self._run_index.error:
+                self.debug_print(f"The run graph index was disabled after an error: {self._run_index.error}")
+            self._run_index.close()
+            self._run_index = None
+
         # Save the state, this data is saved across actions and app upgrades
         self.save_state(self._state)
         return phantom.APP_SUCCESS
@@ -497,6 +1916,7 @@ def main():
     import sys
 
     import pudb
+    import requests
 
     pudb.set_trace()
 
@@ -0,0 +1,118 @@
+# File: playbookutils_consts.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+# Name of the vault file a playbook tree is exported to
+PLAYBOOKUTILS_EXPORT_FILE_NAME = "playbook_tree_{run_id}.ndjson.gz"
+
+# Maximum length of the URL encoded value of an `_filter_<field>__in` query parameter. Larger id lists are split into several requests.
+PLAYBOOKUTILS_MAX_FILTER_LENGTH = 4000
+
+# Statuses of playbook runs and app runs that will not change anymore
+PLAYBOOKUTILS_TERMINAL_STATUSES = ("success", "failed", "cancelled", "canceled")
+
+# Fields of the playbook runs and app runs that are needed to build, expand and render the tree
+PLAYBOOKUTILS_REQUIRED_RUN_FIELDS = (
+    "id",
+    "parent_run",
+    "playbook_run",
+    "_pretty_playbook",
+    "action",
+    "_pretty_action_run",
+    "status",
+    "update_time",
+)
+
+# Fields of the playbook runs and app runs read by the tree statistics, on top of the fields needed to build the tree
+PLAYBOOKUTILS_STATS_RUN_FIELDS = ("app_name", "start_time", "end_time")
+
+# Snapshots of the last fetched playbook trees, used to only return the changes on the next call. The unchanged runs are rebuilt
+# from the snapshot, so it holds every field needed to build the tree and compute its statistics.
+PLAYBOOKUTILS_SNAPSHOT_STATE_KEY = "playbook_tree_snapshots"
+PLAYBOOKUTILS_MAX_SNAPSHOTS = 10
+PLAYBOOKUTILS_MAX_SNAPSHOT_BYTES = 262144
+PLAYBOOKUTILS_SNAPSHOT_FIELDS = (*PLAYBOOKUTILS_REQUIRED_RUN_FIELDS, *PLAYBOOKUTILS_STATS_RUN_FIELDS)
+# Seconds the cursor time is moved back on top of the time the queries took, for the delay between a run update and its update time
+PLAYBOOKUTILS_CURSOR_OVERLAP = 5
+
+# Fields of the app runs added by the app run enrichment
+PLAYBOOKUTILS_APP_RUN_DETAIL_FIELDS = ("start_time", "end_time", "message", "asset", "_pretty_asset")
+
+# Asset configuration defaults
+PLAYBOOKUTILS_DEFAULT_MAX_CONCURRENT_REQUESTS = 1
+PLAYBOOKUTILS_DEFAULT_MAX_TREE_DEPTH = 100
+PLAYBOOKUTILS_DEFAULT_TREE_CACHE_MAX_ENTRIES = 1000
+PLAYBOOKUTILS_DEFAULT_TREE_CACHE_MAX_AGE = 3600
+PLAYBOOKUTILS_DEFAULT_TREE_CACHE_MAX_BYTES = 16777216
+# A maximum age of 0 disables the run graph index
+PLAYBOOKUTILS_DEFAULT_RUN_INDEX_MAX_AGE = 86400
+PLAYBOOKUTILS_DEFAULT_RUN_FIELDS = "id,parent_run,_pretty_playbook,action,_pretty_action_run,status,app_name,start_time,end_time"
+# A page size of 0 gets all the runs in a single response
+PLAYBOOKUTILS_DEFAULT_PAGE_SIZE = 0
+# A maximum of 0 nodes does not limit the size of the tree
+PLAYBOOKUTILS_DEFAULT_MAX_NODES = 0
+PLAYBOOKUTILS_DEFAULT_OUTPUT_MODE = "full"
+PLAYBOOKUTILS_DEFAULT_SCOPE = "root"
+PLAYBOOKUTILS_DEFAULT_DEBUG_CAPTURE = "errors"
+PLAYBOOKUTILS_DEFAULT_DEBUG_CAPTURE_BYTES = 4096
+PLAYBOOKUTILS_DEFAULT_REQUEST_TIMEOUT = 30
+PLAYBOOKUTILS_DEFAULT_MAX_RETRIES = 3
+PLAYBOOKUTILS_DEFAULT_RETRY_BACKOFF_MS = 500
+# A limit of 0 requests per second does not limit the requests
+PLAYBOOKUTILS_DEFAULT_MAX_REQUESTS_PER_SECOND = 0
+PLAYBOOKUTILS_DEFAULT_WAIT_OUTPUT_MODE = "summary"
+PLAYBOOKUTILS_DEFAULT_WAIT_TIMEOUT = 600
+PLAYBOOKUTILS_DEFAULT_POLL_INTERVAL = 5
+
+# Parts of the playbook tree added to the action result, from the largest to the smallest
+PLAYBOOKUTILS_OUTPUT_MODES = ("full", "compact", "summary", "rendered")
+
+# Playbook run a tree starts from: the root playbook run, or the given playbook run
+PLAYBOOKUTILS_SCOPES = ("root", "run")
+
+# Responses added to the debug data: none, only the failed ones, or all of them cut to the configured number of bytes
+PLAYBOOKUTILS_DEBUG_CAPTURE_POLICIES = ("errors", "off", "truncated")
+
+# Longest time between two polls of wait for playbook tree in seconds, the interval doubles up to it while nothing changes
+PLAYBOOKUTILS_MAX_POLL_INTERVAL = 60
+
+# Responses that are retried, and the longest wait before a retry in seconds, Retry-After included
+PLAYBOOKUTILS_RETRY_STATUS_CODES = (429, 502, 503, 504)
+PLAYBOOKUTILS_MAX_RETRY_DELAY = 60
+
+# File of the app state directory holding the next free request slot, shared by every action run of the app
+PLAYBOOKUTILS_RATE_LIMIT_FILE = "playbookutils_rate_limit"
+
+# SQLite database of the app state directory holding the run graph index and the playbook tree cache, shared by every action run
+# of the app
+PLAYBOOKUTILS_RUN_INDEX_FILE = "playbookutils_run_index.sqlite3"
+
+# Validation messages
+PLAYBOOKUTILS_VALID_INT_MSG = "Please provide a valid integer value in the '{key}' parameter"
+PLAYBOOKUTILS_NON_NEG_INT_MSG = "Please provide a valid non-negative integer value in the '{key}' parameter"
+PLAYBOOKUTILS_NON_NEG_NON_ZERO_INT_MSG = "Please provide a valid non-zero positive integer value in the '{key}' parameter"
+PLAYBOOKUTILS_INVALID_OUTPUT_MODE_MSG = "Please provide one of {modes} in the 'output_mode' parameter"
+PLAYBOOKUTILS_INVALID_SCOPE_MSG = "Please provide one of {scopes} in the 'scope' parameter"
+PLAYBOOKUTILS_INVALID_DEBUG_CAPTURE_MSG = "Please provide one of {policies} in the 'debug_capture' parameter"
+
+# Error messages
+PLAYBOOKUTILS_PARENT_CYCLE_MSG = "Cycle detected in the parent playbook runs: {chain}"
+PLAYBOOKUTILS_INVALID_CURSOR_MSG = "Invalid since_cursor '{cursor}', please use the next_cursor returned by a previous call"
+PLAYBOOKUTILS_MAX_TREE_DEPTH_MSG = "Maximum tree depth of {depth} reached when trying to get to the root playbook run"
+PLAYBOOKUTILS_NO_PLAYBOOK_RUNS_MSG = "Please provide the playbook_run_ids or container_id parameter"
+PLAYBOOKUTILS_PRUNED_CURSOR_MSG = (
+    "The since_cursor and track_changes parameters can not be combined with the scope, max_depth, app_run_status or app_name parameters"
+)
+PLAYBOOKUTILS_VAULT_ADD_MSG = "Unable to add the playbook tree export to the vault: {message}"
+PLAYBOOKUTILS_WAIT_TIMEOUT_MSG = "Timed out after {timeout} seconds with {count} run(s) still running, after {polls} poll(s)"
@@ -0,0 +1,54 @@
+# File: playbookutils_html.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+from html.parser import HTMLParser
+
+
+class _TextExtractor(HTMLParser):
+    """Collect the text of an HTML document, without the content of the script and style elements."""
+
+    SKIPPED_TAGS = ("script", "style")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skipped = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skipped += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self._skipped:
+            self._skipped -= 1
+
+    def handle_data(self, data):
+        if not self._skipped:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    """Extract the text of an HTML error page with the standard library parser, for when BeautifulSoup is not available.
+
+    Args:
+        html (str): HTML document
+
+    Returns:
+        str: Text of the document
+    """
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return "".join(extractor.parts)
@@ -0,0 +1,260 @@
+# File: playbookutils_index.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import json
+import sqlite3
+import time
+
+
+# Seconds to wait for the lock of another writer before giving up
+_BUSY_TIMEOUT = 10
+
+# Maximum number of run IDs in the IN clause of one query, below the SQLite limit of host parameters
+_MAX_QUERY_IDS = 500
+
+# Version of the tables, they are created in a new database that does not have a version yet
+_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE parents (run_id INTEGER PRIMARY KEY, parent_run INTEGER, saved REAL NOT NULL);
+CREATE TABLE children (
+    pb_run_id INTEGER NOT NULL,
+    fields TEXT NOT NULL,
+    app_runs TEXT NOT NULL,
+    pb_runs TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    saved REAL NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (pb_run_id, fields)
+);
+CREATE INDEX parents_saved ON parents (saved);
+CREATE INDEX children_saved ON children (saved);
+CREATE INDEX children_used ON children (used);
+"""
+
+
+class RunGraphIndex:
+    """Index of the playbook run graph in an SQLite database of the app state directory, shared by every action run of the app.
+
+    It holds the parent of the playbook runs, and the playbook tree cache: the child playbook runs and app runs of the playbook runs
+    whose children will not change anymore. Action runs are separate processes that can read and write the index at the same time,
+    so the database uses write-ahead logging and waits for the locks of other writers. Run details depend on the configured run
+    fields, so the children are stored per set of run fields. Parents expire after their maximum age, children after theirs, and
+    the least recently used children are evicted beyond the maximum number of entries or bytes. A database error disables the index
+    for the rest of the action run instead of failing it.
+    """
+
+    def __init__(self, path, fields_key, max_age, max_entries=0, entries_max_age=0, max_bytes=0):
+        """Open the index, creating it if needed.
+
+        Args:
+            path (str): Path of the database file, None disables the index
+            fields_key (str): Run fields of the stored run details, like "id,parent_run,status" or "*"
+            max_age (int): Maximum age of a parent in seconds, 0 does not store the parents
+            max_entries (int): Maximum number of playbook runs with stored children, 0 does not store the children
+            entries_max_age (int): Maximum age of the children of a playbook run in seconds
+            max_bytes (int): Maximum size of the stored children in bytes, 0 does not limit the size
+        """
+        self._fields_key = fields_key
+        self._max_age = max_age
+        self._max_entries = max_entries
+        self._entries_max_age = entries_max_age
+        self._max_bytes = max_bytes
+        self._connection = None
+        # Playbook runs whose children were used, their last use is saved with the next expiry
+        self._used = set()
+        self.error = None
+        self.hits = 0
+        self.misses = 0
+
+        if not path or not (max_age or max_entries):
+            return
+
+        try:
+            self._connection = sqlite3.connect(path, timeout=_BUSY_TIMEOUT, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                if self._connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                    for statement in _SCHEMA.strip().split(";\n"):
+                        self._connection.execute(statement)
+                    self._connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    @property
+    def enabled(self):
+        return self._connection is not None
+
+    @property
+    def parents_enabled(self):
+        return self.enabled and bool(self._max_age)
+
+    @property
+    def children_enabled(self):
+        return self.enabled and bool(self._max_entries)
+
+    def get_parents(self, run_ids):
+        """Get the known parents of playbook runs.
+
+        Args:
+            run_ids (list): Playbook run IDs
+
+        Returns:
+            dict: Parent playbook run ID keyed by playbook run ID, None for root playbook runs, unknown playbook runs are left out
+        """
+        if not self.parents_enabled:
+            return {}
+
+        rows = self._select("SELECT run_id, parent_run FROM parents WHERE saved > ? AND run_id IN ({ids})", run_ids, self._max_age)
+        return dict(rows)
+
+    def put_parents(self, parent_runs):
+        """Store the parents of playbook runs.
+
+        Args:
+            parent_runs (dict): Parent playbook run ID keyed by playbook run ID, None for root playbook runs
+        """
+        if not self.parents_enabled:
+            return
+
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO parents (run_id, parent_run, saved) VALUES (?, ?, ?)",
+            [(run_id, parent_run, now) for run_id, parent_run in parent_runs.items()],
+        )
+
+    def get_children(self, pb_run_ids):
+        """Get the children of playbook runs.
+
+        Args:
+            pb_run_ids (list): Playbook run IDs
+
+        Returns:
+            dict: Entries with the "app_runs" and "pb_runs" details keyed by playbook run ID, for the stored playbook runs only
+        """
+        if not self.children_enabled:
+            return {}
+
+        rows = self._select(
+            "SELECT pb_run_id, app_runs, pb_runs FROM children WHERE saved > ? AND fields = ? AND pb_run_id IN ({ids})",
+            pb_run_ids,
+            self._entries_max_age,
+            (self._fields_key,),
+        )
+        children = {pb_run_id: {"app_runs": json.loads(app_runs), "pb_runs": json.loads(pb_runs)} for pb_run_id, app_runs, pb_runs in rows}
+        self._used.update(children)
+        self.hits += len(children)
+        self.misses += len(pb_run_ids) - len(children)
+        return children
+
+    def put_children(self, children):
+        """Store the children of playbook runs whose children will not change anymore. Playbook runs with more children than the
+        maximum size are not stored.
+
+        Args:
+            children (dict): Tuples of the app run details and child playbook run details keyed by playbook run ID
+        """
+        if not self.children_enabled:
+            return
+
+        now = time.time()
+        rows = []
+        for pb_run_id, (app_runs, pb_runs) in children.items():
+            app_runs, pb_runs = json.dumps(app_runs), json.dumps(pb_runs)
+            size = len(app_runs) + len(pb_runs)
+            if not self._max_bytes or size <= self._max_bytes:
+                rows.append((pb_run_id, self._fields_key, app_runs, pb_runs, size, now, now))
+
+        self._write(
+            "INSERT OR REPLACE INTO children (pb_run_id, fields, app_runs, pb_runs, size, saved, used) VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def expire(self):
+        """Save the last use of the children read by this action run, then drop the expired entries, and the least recently used
+        children beyond the maximum number of entries or bytes."""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        used = list(self._used)
+        try:
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                for start in range(0, len(used), _MAX_QUERY_IDS):
+                    batch = used[start : start + _MAX_QUERY_IDS]
+                    self._connection.execute(
+                        f"UPDATE children SET used = ? WHERE fields = ? AND pb_run_id IN ({','.join('?' * len(batch))})",
+                        (now, self._fields_key, *batch),
+                    )
+                # Other assets of the app may store parents or children while this one does not, so their entries are kept
+                if self._max_age:
+                    self._connection.execute("DELETE FROM parents WHERE saved <= ?", (now - self._max_age,))
+                if self._max_entries:
+                    self._connection.execute("DELETE FROM children WHERE saved <= ?", (now - self._entries_max_age,))
+                    self._connection.execute(
+                        "DELETE FROM children WHERE rowid IN (SELECT rowid FROM children ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                        (self._max_entries,),
+                    )
+                if self._max_entries and self._max_bytes:
+                    self._connection.execute(
+                        "DELETE FROM children WHERE rowid IN ("
+                        "SELECT rowid FROM (SELECT rowid, SUM(size) OVER (ORDER BY used DESC, rowid) AS total FROM children) WHERE total > ?"
+                        ")",
+                        (self._max_bytes,),
+                    )
+            self._used.clear()
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _select(self, query, run_ids, max_age, params=()):
+        """Run a query for run IDs in batches, the {ids} placeholder of the query is replaced with the placeholders of a batch."""
+        if not run_ids:
+            return []
+
+        run_ids = list(run_ids)
+        oldest = time.time() - max_age
+        rows = []
+        try:
+            for start in range(0, len(run_ids), _MAX_QUERY_IDS):
+                batch = run_ids[start : start + _MAX_QUERY_IDS]
+                rows.extend(self._connection.execute(query.format(ids=",".join("?" * len(batch))), (oldest, *params, *batch)))
+        except sqlite3.Error as e:
+            self._disable(e)
+            return []
+
+        return rows
+
+    def _write(self, query, rows):
+        """Write rows in a single transaction, so concurrent writers take the write lock once per batch."""
+        if not rows:
+            return
+
+        try:
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                self._connection.executemany(query, rows)
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def _disable(self, error):
+        self.error = str(error)
+        self.close()
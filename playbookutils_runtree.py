@@ -0,0 +1,263 @@
+# File: playbookutils_runtree.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import sys
+from array import array
+
+
+FIGURE_SPACE = "\u2007"
+
+
+class RunTree:
+    """Compact tree of playbook runs and app runs.
+
+    Nodes are referenced by their index and stored in parallel arrays instead of one object per node. The links between nodes are
+    kept as parent, first child, last child and next sibling indexes, and the repeated name and status strings are interned. The
+    PlaybookRun and AppRun classes are only built on demand as a view of the tree with `to_anytree`, so anytree is only imported
+    then.
+    """
+
+    __slots__ = (
+        "_actions",
+        "_details",
+        "_first_child",
+        "_last_child",
+        "_names",
+        "_next_sibling",
+        "_parents",
+        "_run_ids",
+        "_statuses",
+        "_types",
+        "errors",
+    )
+
+    TYPES = ("playbook", "app")
+
+    # Same guides as the default ContStyle of anytree's RenderTree
+    VERTICAL = "│   "
+    CONT = "├── "
+    END = "└── "
+    EMPTY = "    "
+
+    def __init__(self, details_store=None):
+        """
+        Args:
+            details_store (list): List-like store the run details are appended to, like SpilledDetails, a plain list by default
+        """
+        self._run_ids = array("q")
+        self._parents = array("q")
+        self._first_child = array("q")
+        self._last_child = array("q")
+        self._next_sibling = array("q")
+        self._types = bytearray()
+        self._names = []
+        self._actions = []
+        self._statuses = []
+        self._details = [] if details_store is None else details_store
+        # Errors that happened while expanding a node, keyed by node index
+        self.errors = {}
+
+    def __len__(self):
+        return len(self._run_ids)
+
+    def add(self, run_details, run_type, parent=-1):
+        """Add a run as the last child of a node.
+
+        Args:
+            run_details (dict): Run details
+            run_type (str): Type of the run (playbook or app)
+            parent (int): Index of the parent node, -1 for the root node
+
+        Returns:
+            int: Index of the new node
+        """
+        index = len(self._run_ids)
+
+        self._run_ids.append(run_details["id"])
+        self._parents.append(parent)
+        self._first_child.append(-1)
+        self._last_child.append(-1)
+        self._next_sibling.append(-1)
+        self._types.append(self.TYPES.index(run_type))
+        self._statuses.append(_intern(run_details.get("status")))
+        self._details.append(run_details)
+
+        if run_type == "app":
+            self._names.append(_intern(run_details["action"]))
+            self._actions.append(_intern(run_details["_pretty_action_run"]))
+        else:
+            self._names.append(_intern(run_details["_pretty_playbook"]))
+            self._actions.append(None)
+
+        if parent >= 0:
+            if self._last_child[parent] < 0:
+                self._first_child[parent] = index
+            else:
+                self._next_sibling[self._last_child[parent]] = index
+            self._last_child[parent] = index
+
+        return index
+
+    def run_id(self, index):
+        return self._run_ids[index]
+
+    def parent(self, index):
+        return self._parents[index]
+
+    def type(self, index):
+        return self.TYPES[self._types[index]]
+
+    def name(self, index):
+        return self._names[index]
+
+    def action(self, index):
+        return self._actions[index]
+
+    def status(self, index):
+        return self._statuses[index]
+
+    def details(self, index):
+        return self._details[index]
+
+    def update_details(self, index, run_details):
+        """Merge fields into the details of a node. The name, action and status of the node are not updated."""
+        self._details[index] = {**self._details[index], **run_details}
+
+    def add_error(self, index, message):
+        """Record an error that happened while expanding a node."""
+        self.errors.setdefault(index, []).append(message)
+
+    def children(self, index):
+        """Iterate over the indexes of the children of a node, in the order they were added."""
+        child = self._first_child[index]
+        while child >= 0:
+            yield child
+            child = self._next_sibling[child]
+
+    def iter_subtree(self, root=0):
+        """Iterate over the indexes of a node and all its descendants, in pre-order."""
+        if not len(self):
+            return
+
+        stack = [root]
+        while stack:
+            index = stack.pop()
+            yield index
+            stack.extend(reversed(list(self.children(index))))
+
+    def iter_render(self, root=0):
+        """Walk the tree in pre-order, with the same prefix and fill strings as anytree's RenderTree.
+
+        Args:
+            root (int): Index of the node to start from
+
+        Yields:
+            str: Prefix of the node, to print before it
+            str: Fill of the node, to print before the lines that follow it
+            int: Index of the node
+        """
+        if not len(self):
+            return
+
+        # (index, indent of the node, whether it is the last child), the root has no guides
+        stack = [(root, "", None)]
+        while stack:
+            index, indent, is_last = stack.pop()
+            if is_last is None:
+                pre = fill = ""
+            else:
+                pre = indent + (self.END if is_last else self.CONT)
+                fill = indent + (self.EMPTY if is_last else self.VERTICAL)
+
+            yield pre, fill, index
+
+            children = list(self.children(index))
+            for position in range(len(children) - 1, -1, -1):
+                stack.append((children[position], fill, position == len(children) - 1))
+
+    def iter_output(self, root=0):
+        """Walk the tree once in pre-order and build the output of each node. The data holds the same fields as anytree's DictExporter
+        gives for a PlaybookRun or AppRun without its children, so no subtree is copied. Spaces in the prefix and fill are replaced with
+        figure spaces so they do not get chopped down in the action results UI.
+
+        Args:
+            root (int): Index of the node to start from
+
+        Yields:
+            int: Index of the node
+            dict: Flat data of the node
+            str: Text line of the node in the rendered tree
+        """
+        for pre, fill, index in self.iter_render(root):
+            pre = pre.replace(" ", FIGURE_SPACE)
+            fill = fill.replace(" ", FIGURE_SPACE)
+
+            data = {"type": self.TYPES[self._types[index]], "run_id": self._run_ids[index], "name": self._names[index]}
+            if self._types[index]:
+                data["action"] = self._actions[index]
+                data["status"] = self._statuses[index]
+
+            data["run_details"] = self._details[index]
+            if index in self.errors:
+                data["errors"] = self.errors[index]
+            data["tree_prefix"] = pre
+            data["tree_fill"] = fill
+
+            yield index, data, self._render_line(pre, index)
+
+    def iter_lines(self, root=0):
+        """Walk the tree once in pre-order and only build the text line of each node in the rendered tree.
+
+        Args:
+            root (int): Index of the node to start from
+
+        Yields:
+            int: Index of the node
+            str: Text line of the node in the rendered tree
+        """
+        for pre, _, index in self.iter_render(root):
+            yield index, self._render_line(pre.replace(" ", FIGURE_SPACE), index)
+
+    def _render_line(self, pre, index):
+        run_type = self.TYPES[self._types[index]]
+        if self._types[index]:
+            return f"{pre}<{run_type}-{self._run_ids[index]}> {self._actions[index]} [{self._statuses[index]}]"
+        return f"{pre}<{run_type}-{self._run_ids[index]}> {self._names[index]}"
+
+    def to_anytree(self, root=0):
+        """Build the PlaybookRun and AppRun view of the tree.
+
+        Args:
+            root (int): Index of the node to start from
+
+        Returns:
+            PlaybookRun: Root playbook run
+        """
+        from playbookutils_anytree import AppRun, PlaybookRun
+
+        nodes = {}
+        for _, _, index in self.iter_render(root):
+            parent = nodes.get(self._parents[index])
+            node = (AppRun if self._types[index] else PlaybookRun)(self._details[index], parent)
+            for message in self.errors.get(index, []):
+                node.add_error(message)
+            nodes[index] = node
+
+        return nodes.get(root)
+
+
+def _intern(value):
+    """Intern repeated strings, so each distinct name or status is only stored once."""
+    return sys.intern(value) if isinstance(value, str) else value
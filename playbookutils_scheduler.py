@@ -0,0 +1,119 @@
+# File: playbookutils_scheduler.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import fcntl
+import random
+import struct
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class RequestScheduler:
+    """Decide when the REST calls of an action run are sent and retried.
+
+    Failed calls are retried with a jittered exponential backoff, or after the delay asked by the Retry-After header of the response.
+    The requests per second limit is shared by every action run of the app: the time of the next free request slot is kept in a
+    file of the app state directory, which is locked while a request takes its slot.
+    """
+
+    def __init__(self, max_retries, backoff, max_delay, retry_status_codes, max_requests_per_second=0, rate_limit_file=None):
+        """
+        Args:
+            max_retries (int): Number of times a failed call is retried
+            backoff (float): Base delay of the exponential backoff in seconds
+            max_delay (float): Maximum delay before a retry in seconds
+            retry_status_codes (tuple): Status codes of the responses that are retried
+            max_requests_per_second (float): Maximum requests per second across action runs, 0 does not limit the requests
+            rate_limit_file (str): Path of the file that holds the next free request slot
+        """
+        self.max_retries = max_retries
+        self._backoff = backoff
+        self._max_delay = max_delay
+        self._retry_status_codes = retry_status_codes
+        self._interval = 1 / max_requests_per_second if max_requests_per_second else 0
+        self._rate_limit_file = rate_limit_file
+        self._lock = threading.Lock()
+
+        self.retried = 0
+
+    def wait_turn(self):
+        """Wait for the next free request slot when the requests per second are limited."""
+        if not self._interval or not self._rate_limit_file:
+            return
+
+        # The lock file is only held while the slot is taken, the wait happens outside of it
+        with self._lock, open(self._rate_limit_file, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                data = f.read(8)
+                now = time.time()
+                slot = max(struct.unpack("d", data)[0] if len(data) == 8 else 0.0, now)
+                f.seek(0)
+                f.truncate()
+                f.write(struct.pack("d", slot + self._interval))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+        if slot > now:
+            time.sleep(slot - now)
+
+    def retry_delay(self, attempt, response=None, retryable_error=False):
+        """Get the delay before retrying a call.
+
+        Args:
+            attempt (int): Number of the attempt that failed, starting at 0
+            response (Response): Response of the attempt, None if the call raised an error
+            retryable_error (bool): Whether the error raised by the call is transient, like a connection error or a timeout
+
+        Returns:
+            float: Seconds to wait before the next attempt, None if the call should not be retried
+        """
+        if attempt >= self.max_retries:
+            return None
+
+        if response is None:
+            if not retryable_error:
+                return None
+        elif response.status_code not in self._retry_status_codes:
+            return None
+
+        delay = self._get_retry_after(response)
+        if delay is None:
+            # Full jitter, so the action runs that failed at the same time do not retry at the same time
+            delay = random.uniform(0, self._backoff * 2**attempt)
+
+        with self._lock:
+            self.retried += 1
+
+        return min(delay, self._max_delay)
+
+    def _get_retry_after(self, response):
+        """Seconds to wait given by the Retry-After header of a response, either as a number of seconds or as a date."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if not retry_after:
+            return None
+
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+
+        try:
+            return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,110 @@
+# File: playbookutils_stats.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+from collections import Counter
+from datetime import datetime
+
+
+class TreeStats:
+    """Aggregate statistics of a run tree, collected while the output walks the tree so the tree is not traversed again.
+
+    Nodes have to be added in pre-order, so the depth of a node can be derived from the depth of its parent. Durations go from the
+    start_time of a run to its end_time, or to its update_time for playbook runs, and are only counted for runs that have both.
+    """
+
+    def __init__(self, run_tree):
+        self._run_tree = run_tree
+        self._depths = {}
+        self._pb_statuses = Counter()
+        self._app_statuses = Counter()
+        self._apps = Counter()
+        self._actions = Counter()
+        self._fanout = Counter()
+        self._root = None
+        self._start = None
+        self._end = None
+        # Node that finished last, the critical path is the chain of runs from the root down to it
+        self._last_node = None
+        self._slowest_app_run = None
+
+    def add(self, index):
+        """Add a node of the tree, after its parent."""
+        run_tree = self._run_tree
+        parent = run_tree.parent(index)
+        if self._root is None:
+            self._root = index
+            self._depths[index] = 0
+        else:
+            self._depths[index] = self._depths[parent] + 1
+
+        run_details = run_tree.details(index)
+        start = parse_time(run_details.get("start_time"))
+        if run_tree.type(index) == "app":
+            self._app_statuses[run_tree.status(index)] += 1
+            self._apps[run_details.get("app_name")] += 1
+            self._actions[run_tree.name(index)] += 1
+            end = parse_time(run_details.get("end_time"))
+        else:
+            self._pb_statuses[run_tree.status(index)] += 1
+            self._fanout[sum(1 for _ in run_tree.children(index))] += 1
+            end = parse_time(run_details.get("update_time"))
+
+        if start and (self._start is None or start < self._start):
+            self._start = start
+        if end and (self._end is None or end > self._end):
+            self._end = end
+            self._last_node = index
+
+        if start and end and run_tree.type(index) == "app":
+            duration = (end - start).total_seconds()
+            if self._slowest_app_run is None or duration > self._slowest_app_run["duration"]:
+                self._slowest_app_run = {"run_id": run_tree.run_id(index), "name": run_tree.action(index), "duration": duration}
+
+    def summary(self):
+        """Get the aggregates of the nodes added so far.
+
+        Returns:
+            dict: Counts by status, app and action name, maximum depth, fan-out distribution, durations in seconds, and the type and
+                run ID of the runs of the critical path
+        """
+        critical_path = []
+        node = self._last_node
+        while node is not None and node >= 0:
+            critical_path.append({"type": self._run_tree.type(node), "run_id": self._run_tree.run_id(node)})
+            node = None if node == self._root else self._run_tree.parent(node)
+
+        return {
+            "playbook_runs_by_status": dict(self._pb_statuses),
+            "app_runs_by_status": dict(self._app_statuses),
+            "app_runs_by_app": dict(self._apps),
+            "app_runs_by_action": dict(self._actions),
+            "max_depth": max(self._depths.values(), default=0),
+            # Number of playbook runs keyed by their number of children
+            "fanout": {str(children): count for children, count in sorted(self._fanout.items())},
+            "max_fanout": max(self._fanout, default=0),
+            "duration": (self._end - self._start).total_seconds() if self._start and self._end else None,
+            "slowest_app_run": self._slowest_app_run,
+            "critical_path": critical_path[::-1],
+        }
+
+
+def parse_time(value):
+    """Parse a SOAR timestamp like 2021-04-12T18:31:27.160000Z, None if it is missing or invalid."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,118 @@
+# File: playbookutils_timing.py
+#
+# Copyright (c) 2022-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+# Returned by `section` and `json_decode` when timing is disabled, so the hot path only pays for an attribute check
+_DISABLED = nullcontext()
+
+
+class ActionTimer:
+    """Timings of the hot path of an action run: REST calls per endpoint, JSON decoding and named sections of the handler.
+
+    REST calls can be recorded from several worker threads at once. When the timer is disabled nothing is recorded, and `section` and
+    `json_decode` return a shared no-op context manager.
+    """
+
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._json_decode = 0.0
+        self._sections = {}
+
+    def record_request(self, endpoint, elapsed, size):
+        """Record one REST call.
+
+        Args:
+            endpoint (str): REST endpoint name, like playbook_run or app_run
+            elapsed (float): Time until the response was received, in seconds
+            size (int): Size of the response body in bytes
+        """
+        with self._lock:
+            stats = self._requests.setdefault(endpoint, {"latencies": [], "bytes": 0})
+            stats["latencies"].append(elapsed)
+            stats["bytes"] += size
+
+    def json_decode(self):
+        """Context manager that adds the time spent in it to the JSON decoding time."""
+        if not self.enabled:
+            return _DISABLED
+        return self._timed(None)
+
+    def section(self, name):
+        """Context manager that adds the time spent in it to the total of a named section of the action handler."""
+        if not self.enabled:
+            return _DISABLED
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, section):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                if section is None:
+                    self._json_decode += elapsed
+                else:
+                    self._sections[section] = self._sections.get(section, 0.0) + elapsed
+
+    def report(self, node_count, tree_section):
+        """Summarize the recorded timings.
+
+        Args:
+            node_count (int): Number of nodes in the tree
+            tree_section (str): Name of the section that built the tree, used to compute the nodes per second
+
+        Returns:
+            dict: Timings, with durations in milliseconds
+        """
+        requests = {}
+        for endpoint, stats in sorted(self._requests.items()):
+            latencies = sorted(stats["latencies"])
+            requests[endpoint] = {
+                "count": len(latencies),
+                "bytes": stats["bytes"],
+                **{f"p{percentile}_ms": _milliseconds(_percentile(latencies, percentile)) for percentile in self.PERCENTILES},
+                "max_ms": _milliseconds(latencies[-1]),
+            }
+
+        tree_time = self._sections.get(tree_section)
+        return {
+            "requests": requests,
+            "request_count": sum(stats["count"] for stats in requests.values()),
+            "bytes_received": sum(stats["bytes"] for stats in requests.values()),
+            "json_decode_ms": _milliseconds(self._json_decode),
+            "sections_ms": {name: _milliseconds(elapsed) for name, elapsed in self._sections.items()},
+            "nodes": node_count,
+            "nodes_per_second": round(node_count / tree_time, 1) if tree_time else None,
+        }
+
+
+def _percentile(values, percentile):
+    """Nearest rank percentile of sorted values."""
+    return values[max(math.ceil(percentile / 100 * len(values)) - 1, 0)]
+
+
+def _milliseconds(seconds):
+    return round(seconds * 1000, 3)
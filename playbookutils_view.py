@@ -13,6 +13,21 @@
 # either express or implied. See the License for the specific language governing permissions
 # and limitations under the License.# File: playbookutils_view.py
 
+import json
+import uuid
+
+from playbookutils_stats import parse_time
+
+
+# Escaped so the encoded tree can be embedded in a script element of the widget
+_SCRIPT_ESCAPES = {ord("<"): "\\u003C", ord(">"): "\\u003E", ord("&"): "\\u0026"}
+
+# Longer app run messages are cut in the widget
+_MAX_MESSAGE_LENGTH = 200
+
+# Summary fields the widget does not use, they hold one entry per run
+_LARGE_SUMMARY_FIELDS = ("rendered_playbook_tree", "playbook_run_ids", "app_run_ids")
+
 
 def get_ctx_result(provides, result):
     """Function that parses data.
@@ -44,21 +59,110 @@ def get_ctx_result(provides, result):
     return ctx_result
 
 
+def encode_tree(data, rendered_tree=None):
+    """Function that encodes the runs of a tree for the widget.
+
+    The runs are kept in the pre-order of the action result data, as columns instead of one object per run, and the names and
+    statuses are indexes in a table of strings so each distinct string is only sent once. The depth of a run comes from its tree
+    prefix, or from the depth of its parent for the compact output mode. App runs also get their duration in seconds and their result
+    message when their details have them. When the action result only holds the rendered tree, its lines are sent instead.
+
+    :param data: data rows of the action result
+    :param rendered_tree: rendered tree lines of the action result summary
+    :return: encoded tree, None if there is nothing to show
+    """
+
+    if not data or not isinstance(data[0], dict) or "run_id" not in data[0]:
+        return {"lines": rendered_tree} if rendered_tree else None
+
+    strings = []
+    string_indexes = {}
+
+    def string_index(value):
+        if value is None:
+            return -1
+        if value not in string_indexes:
+            string_indexes[value] = len(strings)
+            strings.append(value)
+        return string_indexes[value]
+
+    run_ids = []
+    depths = []
+    types = []
+    statuses = []
+    names = []
+    errors = []
+    durations = []
+    messages = []
+    pb_run_depths = {}
+    for position, row in enumerate(data):
+        is_app = row.get("type") == "app"
+        if "tree_prefix" in row:
+            # Each level of the prefix is 4 characters wide
+            depth = len(row["tree_prefix"]) // 4
+        else:
+            depth = pb_run_depths.get(row.get("parent_run_id"), -1) + 1
+        if not is_app:
+            pb_run_depths[row.get("run_id")] = depth
+
+        run_details = row.get("run_details") or {}
+        status = row.get("status") or run_details.get("status")
+        run_ids.append(row.get("run_id"))
+        depths.append(depth)
+        types.append(1 if is_app else 0)
+        statuses.append(string_index(status))
+        names.append(string_index(row.get("action") if is_app else row.get("name")))
+        if row.get("errors"):
+            errors.append(position)
+
+        duration = None
+        message = None
+        if is_app:
+            start = parse_time(run_details.get("start_time"))
+            end = parse_time(run_details.get("end_time"))
+            duration = round((end - start).total_seconds(), 3) if start and end else None
+            message = run_details.get("message")
+            # Rows are a single line high
+            message = " ".join(message.split())[:_MAX_MESSAGE_LENGTH] if isinstance(message, str) and message.strip() else None
+        durations.append(duration)
+        messages.append(string_index(message))
+
+    return {
+        "strings": strings,
+        "run_ids": run_ids,
+        "depths": depths,
+        "types": types,
+        "statuses": statuses,
+        "names": names,
+        "errors": errors,
+        "durations": durations,
+        "messages": messages,
+    }
+
+
 def display_tree(provides, all_app_runs, context):
     """Function that displays view.
 
+    Only the compact encoding of each tree is added to the context, the widget renders the visible rows in the browser.
+
     :param provides: action name
     :param context: context
     :param all_app_runs: all app runs
     :return: html page
     """
 
+    context["widget_id"] = uuid.uuid4().hex
     context["results"] = results = []
     for summary, action_results in all_app_runs:
         for result in action_results:
             ctx_result = get_ctx_result(provides, result)
             if not ctx_result:
                 continue
+
+            summary = ctx_result["summary"]
+            tree = encode_tree(ctx_result.pop("data"), summary.get("rendered_playbook_tree"))
+            ctx_result["summary"] = {key: value for key, value in summary.items() if key not in _LARGE_SUMMARY_FIELDS}
+            ctx_result["tree_json"] = json.dumps(tree, separators=(",", ":")).translate(_SCRIPT_ESCAPES) if tree else None
             results.append(ctx_result)
 
     return "playbookutils_tree.html"